@@ -1,3 +1,5 @@
+import os
+
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
@@ -6,7 +8,7 @@ from flask_cors import CORS
 
 from extensions import db, migrate, jwt, cors
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
 
     # Configure app
@@ -17,12 +19,26 @@ def create_app():
         JWT_TOKEN_LOCATION=['headers'],
         JWT_HEADER_NAME='Authorization',
         JWT_HEADER_TYPE='Bearer',
-        JWT_ERROR_MESSAGE_KEY='msg'
+        JWT_ERROR_MESSAGE_KEY='msg',
+        PRODUCT_CACHE_SIZE=1024,
+        PRODUCT_CACHE_TTL=60,
+        UPLOAD_FOLDER=os.path.join(app.instance_path, 'uploads'),
+        MAX_IMAGE_SIZE=10 * 1024 * 1024,
+        THUMBNAIL_WORKERS=2,
+        VIEW_COUNT_FLUSH_INTERVAL=10,
+        # Minutes a product is held after being added to a cart, 0 disables holds
+        CART_RESERVATION_MINUTES=0,
+        CART_RESERVATION_SWEEP_INTERVAL=30,
+        # Seconds a stored Idempotency-Key response can be replayed
+        IDEMPOTENCY_KEY_TTL=24 * 60 * 60
     )
+    if test_config:
+        app.config.update(test_config)
     
     # Initialize extensions
     db.init_app(app)
-    migrate.init_app(app, db)
+    # Batch mode lets migrations alter constraints on SQLite tables
+    migrate.init_app(app, db, render_as_batch=True)
     jwt.init_app(app)
     
     # Configure CORS with better support for preflight requests
@@ -30,9 +46,9 @@ def create_app():
                  resources={r"/api/*": {
                      "origins": ["http://localhost:3000"],
                      "supports_credentials": True,
-                     "allow_headers": ["Content-Type", "Authorization"],
+                     "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key"],
                      "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-                     "expose_headers": ["Content-Type", "Authorization"]
+                     "expose_headers": ["Content-Type", "Authorization", "Idempotent-Replayed"]
                  }})
     
     # Import models
@@ -42,6 +58,44 @@ def create_app():
     from models.cart_item import CartItem
     from models.order import Order
     from models.order_item import OrderItem
+    from models.product_tombstone import ProductTombstone
+    from models.idempotency_key import IdempotencyKey
+
+    # Build the full-text search index for products
+    from services.search_index import init_search_index
+    init_search_index(app)
+
+    # Per category/condition counts for the sidebar filters
+    from services.facets import init_facet_counts
+    init_facet_counts(app)
+
+    # In-memory index for search box suggestions
+    from services.suggest_index import init_suggest_index
+    init_suggest_index(app)
+
+    # Trigram index for typo-tolerant search
+    from services.fuzzy_index import init_fuzzy_index
+    init_fuzzy_index(app)
+
+    # Vectors for "similar items" recommendations (needs NumPy)
+    from services.similar_items import init_similar_items
+    init_similar_items(app)
+
+    # Cache for public product reads
+    from services.cache import init_product_cache
+    init_product_cache(app)
+
+    # Content-addressed image uploads and their thumbnails
+    from services.images import init_image_store
+    init_image_store(app)
+
+    # Product views counted in memory and written back in batches
+    from services.view_counts import init_view_counter
+    init_view_counter(app)
+
+    # Releases expired cart reservations in the background
+    from services.cart_reservations import init_cart_reservations
+    init_cart_reservations(app)
 
     # Import and register blueprints
     # Try to use improved authentication first
@@ -60,6 +114,7 @@ def create_app():
         from routes.users import users_bp
         print("Using original users routes")
     from routes.products import products_bp
+    from routes.images import images_bp
     
     # Try to import the fixed cart routes first
     try:
@@ -80,6 +135,7 @@ def create_app():
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(users_bp, url_prefix='/api/users')
     app.register_blueprint(products_bp, url_prefix='/api/products')
+    app.register_blueprint(images_bp, url_prefix='/api/images')
     app.register_blueprint(cart_bp, url_prefix='/api/cart')
     app.register_blueprint(orders_bp, url_prefix='/api/orders')
     
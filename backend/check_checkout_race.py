@@ -0,0 +1,143 @@
+"""
+This script stress tests checkout against concurrent buyers.
+It puts the same product in the cart of many users on a scratch database,
+fires all their checkouts at once and checks that exactly one succeeds.
+Run with: python check_checkout_race.py [buyers] [rounds]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# Add the current directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def setup_round(app, buyer_ids, seller_id, round_number):
+    """
+    Create a product and put it in every buyer's cart
+    """
+    from extensions import db
+    from models.product import Product
+    from models.cart_item import CartItem
+
+    with app.app_context():
+        product = Product(title=f'Contested item {round_number}', price=10.0,
+                          condition='Good', seller_id=seller_id)
+        db.session.add(product)
+        db.session.flush()
+        for buyer_id in buyer_ids:
+            db.session.add(CartItem(user_id=buyer_id, product_id=product.id))
+        db.session.commit()
+        return product.id
+
+
+def race(app, tokens):
+    """
+    Check out every buyer at the same time and return the status codes
+    """
+    barrier = threading.Barrier(len(tokens))
+    statuses = [None] * len(tokens)
+
+    def buy(index, token):
+        client = app.test_client()
+        barrier.wait()
+        response = client.post('/api/cart/checkout', json={},
+                               headers={'Authorization': f'Bearer {token}'})
+        statuses[index] = response.status_code
+
+    threads = [threading.Thread(target=buy, args=(index, token)) for index, token in enumerate(tokens)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses
+
+
+def check_round(app, product_id, statuses):
+    """
+    Return the problems found after one round
+    """
+    from models.product import Product
+    from models.order_item import OrderItem
+
+    issues = []
+    winners = statuses.count(201)
+    if winners != 1:
+        issues.append(f"{winners} checkouts succeeded instead of 1")
+    unexpected = [status for status in statuses if status not in (201, 400, 409)]
+    if unexpected:
+        issues.append(f"Unexpected status codes: {unexpected}")
+
+    with app.app_context():
+        if not Product.query.get(product_id).is_sold:
+            issues.append("Product was not marked as sold")
+        order_items = OrderItem.query.filter_by(product_id=product_id).count()
+        if order_items != 1:
+            issues.append(f"Product is in {order_items} orders")
+    return issues
+
+
+def check_checkout_race(buyers=20, rounds=5):
+    """
+    Run the stress test and return the list of problems found
+    """
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from extensions import db
+    from models.user import User
+
+    print(f"Racing {buyers} buyers for the same product, {rounds} rounds...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directory, 'race.db')}",
+            'UPLOAD_FOLDER': os.path.join(directory, 'uploads'),
+        })
+
+        with app.app_context():
+            db.create_all()
+            users = [User(email=f'buyer{index}@example.com', username=f'buyer{index}')
+                     for index in range(buyers + 1)]
+            for user in users:
+                user.set_password('password')
+            db.session.add_all(users)
+            db.session.commit()
+            seller_id = users[0].id
+            buyer_ids = [user.id for user in users[1:]]
+            tokens = [create_access_token(identity=str(id)) for id in buyer_ids]
+
+        issues = []
+        for round_number in range(1, rounds + 1):
+            product_id = setup_round(app, buyer_ids, seller_id, round_number)
+            statuses = race(app, tokens)
+            problems = check_round(app, product_id, statuses)
+            summary = ', '.join(f"{statuses.count(code)}x {code}" for code in sorted(set(statuses)))
+            print(f"{'✅' if not problems else '❌'} Round {round_number}: {summary}")
+            issues.extend(f"Round {round_number}: {problem}" for problem in problems)
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    return issues
+
+
+if __name__ == "__main__":
+    buyers = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    issues = check_checkout_race(buyers, rounds)
+
+    print("\n" + "=" * 50)
+    print("CHECKOUT RACE SUMMARY")
+    print("=" * 50)
+
+    if not issues:
+        print("\n✅ Exactly one buyer got the product every round!")
+    else:
+        print(f"\n❌ Found {len(issues)} issues:")
+        for issue in issues:
+            print(f"  - {issue}")
+        sys.exit(1)
@@ -0,0 +1,203 @@
+"""
+This script checks that the hot queries of the API are served by indexes.
+It runs EXPLAIN QUERY PLAN for each query shape and reports any full table
+scan or temporary sort. The database must be at the latest migration, and
+the check runs on a temporary copy so the app's startup never writes to it.
+Run with: python check_indexes.py [path to database]
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the current directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def hot_queries():
+    """
+    The query shapes used by the listing, cart and order endpoints
+    """
+    from models.product import Product
+    from models.cart_item import CartItem
+    from models.order import Order
+    from models.order_item import OrderItem
+    from models.product_tombstone import ProductTombstone
+    from models.idempotency_key import IdempotencyKey
+    from sqlalchemy import tuple_
+
+    newest = Product.created_at.desc()
+
+    return [
+        ("products: newest listing",
+         Product.query.filter_by(is_sold=False).order_by(newest).limit(12)),
+        ("products: by category",
+         Product.query.filter_by(is_sold=False, category='Electronics').order_by(newest).limit(12)),
+        ("products: by condition",
+         Product.query.filter_by(is_sold=False, condition='Good').order_by(newest).limit(12)),
+        ("products: most viewed",
+         Product.query.filter_by(is_sold=False).order_by(Product.view_count.desc(), Product.id.desc()).limit(12)),
+        ("products: by seller",
+         Product.query.filter_by(seller_id=1)),
+        ("products: changed since",
+         Product.query.filter(Product.updated_at > '2025-01-01').order_by(Product.updated_at, Product.id)),
+        ("product_tombstones: deleted since",
+         ProductTombstone.query.filter(ProductTombstone.deleted_at > '2025-01-01')
+         .order_by(ProductTombstone.deleted_at, ProductTombstone.product_id)),
+        ("cart_items: by user",
+         CartItem.query.filter_by(user_id=1)),
+        ("cart_items: by user and product",
+         CartItem.query.filter_by(user_id=1, product_id=1)),
+        ("cart_items: by product",
+         CartItem.query.filter_by(product_id=1)),
+        ("cart_items: active holds on a product",
+         CartItem.query.filter(CartItem.product_id == 1, CartItem.reserved_until > '2025-01-01')),
+        ("cart_items: expired holds",
+         CartItem.query.filter(CartItem.reserved_until < '2025-01-01').limit(500)),
+        ("idempotency_keys: by user, endpoint and key",
+         IdempotencyKey.query.filter_by(user_id=1, endpoint='checkout', key='abc')),
+        ("idempotency_keys: expired",
+         IdempotencyKey.query.filter(IdempotencyKey.expires_at <= '2025-01-01').limit(500)),
+        ("orders: by user, newest first",
+         Order.query.filter_by(user_id=1).order_by(Order.created_at.desc(), Order.id.desc()).limit(21)),
+        ("orders: by user, page after a cursor",
+         Order.query.filter_by(user_id=1)
+         .filter(tuple_(Order.created_at, Order.id) < ('2025-01-01', 1))
+         .order_by(Order.created_at.desc(), Order.id.desc()).limit(21)),
+        ("orders: all users, newest first",
+         Order.query.order_by(Order.created_at.desc(), Order.id.desc()).limit(21)),
+        ("order_items: by order",
+         OrderItem.query.filter_by(order_id=1)),
+        ("order_items: by product",
+         OrderItem.query.filter_by(product_id=1)),
+    ]
+
+
+def explain(query):
+    """
+    Return the EXPLAIN QUERY PLAN details for a query
+    """
+    from extensions import db
+
+    sql = str(query.statement.compile(
+        dialect=db.engine.dialect,
+        compile_kwargs={"literal_binds": True}
+    ))
+    rows = db.session.execute(db.text(f"EXPLAIN QUERY PLAN {sql}")).all()
+    return [row[-1] for row in rows]
+
+
+DEFAULT_DATABASE = Path(__file__).parent / 'instance' / 'ecofinds.db'
+
+
+def migration_status(database):
+    """
+    Return (current revision, head revisions) for a database file
+    """
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config()
+    config.set_main_option('script_location', str(Path(__file__).parent / 'migrations'))
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+
+    connection = sqlite3.connect(f'file:{database}?mode=ro', uri=True)
+    try:
+        current = {row[0] for row in connection.execute("SELECT version_num FROM alembic_version")}
+    except sqlite3.OperationalError:
+        # Created before migrations were introduced
+        current = set()
+    finally:
+        connection.close()
+    return current, heads
+
+
+def copy_database(database, directory):
+    """
+    Copy a database with the SQLite backup API and return the copy's path
+    """
+    copy = os.path.join(directory, 'check.db')
+    source = sqlite3.connect(f'file:{database}?mode=ro', uri=True)
+    target = sqlite3.connect(copy)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    return copy
+
+
+def check_indexes():
+    """
+    Check every hot query and return the list of problems found
+    """
+    from sqlalchemy.exc import OperationalError
+
+    print("Checking query plans...")
+    issues = []
+
+    for name, query in hot_queries():
+        try:
+            details = explain(query)
+        except OperationalError as e:
+            issue = f"❌ {name}: {e.orig}, is the database at the latest migration?"
+            print(issue)
+            issues.append(issue)
+            continue
+        problems = [
+            detail for detail in details
+            if (detail.startswith('SCAN') and 'USING' not in detail)
+            or 'TEMP B-TREE' in detail
+        ]
+        if problems:
+            issue = f"❌ {name}: {'; '.join(problems)}"
+            print(issue)
+            issues.append(issue)
+        else:
+            print(f"✅ {name}: {'; '.join(details)}")
+
+    print("\n" + "="*50)
+    print("INDEX CHECK SUMMARY")
+    print("="*50)
+
+    if issues:
+        print(f"\nFound {len(issues)} queries without a usable index:")
+        for i, issue in enumerate(issues, 1):
+            print(f"{i}. {issue}")
+        print("\nRun 'flask --app app:create_app db upgrade' to add missing indexes.")
+    else:
+        print("\n✅ All hot queries use an index!")
+
+    return issues
+
+
+if __name__ == '__main__':
+    from app import create_app
+
+    database = Path(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DATABASE
+    if not database.is_file():
+        print(f"❌ No database found at {database}")
+        sys.exit(1)
+
+    current, heads = migration_status(database)
+    if current != heads:
+        print(f"❌ Database is not at the latest migration "
+              f"(at {', '.join(sorted(current)) or 'no revision'}, head is {', '.join(sorted(heads))})")
+        print("Run 'flask --app app:create_app db upgrade' first.")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{copy_database(database, directory)}",
+            'UPLOAD_FOLDER': os.path.join(directory, 'uploads'),
+        })
+
+        with app.app_context():
+            issues = check_indexes()
+            db = app.extensions['sqlalchemy']
+            db.session.remove()
+            db.engine.dispose()
+
+    sys.exit(1 if issues else 0)
@@ -0,0 +1,162 @@
+"""
+This script checks that listing endpoints run a constant number of queries.
+It seeds a scratch database, calls each endpoint at two page sizes while
+counting the SQL statements sent to the database, and reports every
+endpoint whose count grows with the number of items on the page.
+Run with: python check_query_counts.py [small] [large]
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add the current directory to the Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def seed(app, size, roles):
+    """
+    Create a buyer with size cart items and size orders and a seller with
+    size listings, every product from a different seller with a role.
+    Returns the buyer and merchant ids.
+    """
+    from extensions import db
+    from models.user import User
+    from models.product import Product
+    from models.cart_item import CartItem
+    from models.order import Order
+    from models.order_item import OrderItem
+
+    with app.app_context():
+        def user(name, role=None):
+            user = User(email=f'{name}@example.com', username=name, role=role)
+            user.set_password('password')
+            db.session.add(user)
+            return user
+
+        buyer = user(f'buyer{size}')
+        merchant = user(f'merchant{size}', roles[0])
+        sellers = [user(f'seller{size}-{index}', roles[index % len(roles)]) for index in range(size)]
+        db.session.flush()
+
+        for index, seller in enumerate(sellers):
+            listing = Product(title=f'Listing {size}-{index}', price=10.0, condition='Good',
+                              category='Books', seller_id=merchant.id)
+            in_cart = Product(title=f'Cart item {size}-{index}', price=10.0, condition='Good',
+                              category='Books', seller_id=seller.id)
+            sold = Product(title=f'Sold item {size}-{index}', price=10.0, condition='Good',
+                           category='Books', seller_id=seller.id, is_sold=True)
+            db.session.add_all([listing, in_cart, sold])
+            db.session.flush()
+
+            db.session.add(CartItem(user_id=buyer.id, product_id=in_cart.id))
+            order = Order(user_id=buyer.id, total_amount=sold.price, status='delivered')
+            order.order_items.append(OrderItem(product_id=sold.id, price=sold.price))
+            db.session.add(order)
+
+        db.session.commit()
+        return buyer.id, merchant.id
+
+
+def count_queries(app, path, token=None):
+    """
+    Request path and return (status code, number of SQL statements run)
+    """
+    from extensions import db
+    from sqlalchemy import event
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    # Cached responses would skip the queries being counted
+    app.extensions['product_cache'].clear()
+
+    headers = {'Authorization': f'Bearer {token}'} if token else {}
+    event.listen(engine, 'before_cursor_execute', count)
+    try:
+        response = app.test_client().get(path, headers=headers)
+    finally:
+        event.remove(engine, 'before_cursor_execute', count)
+    return response.status_code, len(statements)
+
+
+def check_query_counts(small=3, large=12):
+    """
+    Run every endpoint at both page sizes and return the list of problems found
+    """
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from extensions import db
+    from models.roles import Role
+
+    print(f"Counting queries per endpoint at page sizes {small} and {large}...")
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directory, 'counts.db')}",
+            'UPLOAD_FOLDER': os.path.join(directory, 'uploads'),
+        })
+
+        with app.app_context():
+            db.create_all()
+            roles = [Role(name='user'), Role(name='seller'), Role(name='admin')]
+            db.session.add_all(roles)
+            db.session.commit()
+
+        tokens = {}
+        for size in (small, large):
+            buyer_id, merchant_id = seed(app, size, roles)
+            with app.app_context():
+                tokens[size] = (create_access_token(identity=str(buyer_id)),
+                                create_access_token(identity=str(merchant_id)))
+
+        endpoints = [
+            ("products: listing", lambda size: (f'/api/products?per_page={size}', None)),
+            ("products: listing by cursor", lambda size: (f'/api/products?cursor=&per_page={size}', None)),
+            ("users: own products", lambda size: ('/api/users/products', tokens[size][1])),
+            ("cart", lambda size: ('/api/cart', tokens[size][0])),
+            ("orders", lambda size: (f'/api/orders?per_page={size}', tokens[size][0])),
+        ]
+
+        issues = []
+        for name, request_for in endpoints:
+            counts = {}
+            for size in (small, large):
+                status, counts[size] = count_queries(app, *request_for(size))
+                if status != 200:
+                    issues.append(f"{name}: returned {status} at page size {size}")
+            grows = counts[large] > counts[small]
+            print(f"{'❌' if grows else '✅'} {name}: {counts[small]} queries for {small} items, "
+                  f"{counts[large]} for {large}")
+            if grows:
+                issues.append(f"{name}: {counts[small]} queries for {small} items but "
+                              f"{counts[large]} for {large}")
+
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    return issues
+
+
+if __name__ == "__main__":
+    small = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    large = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    issues = check_query_counts(small, large)
+
+    print("\n" + "=" * 50)
+    print("QUERY COUNT SUMMARY")
+    print("=" * 50)
+
+    if not issues:
+        print("\n✅ Every endpoint ran the same number of queries at both page sizes!")
+    else:
+        print(f"\n❌ Found {len(issues)} issues:")
+        for issue in issues:
+            print(f"  - {issue}")
+        sys.exit(1)
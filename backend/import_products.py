@@ -0,0 +1,59 @@
+"""
+This script bulk imports products for one seller from a CSV or JSON Lines
+file. Rows are validated like POST /api/products and inserted in batches;
+invalid rows are reported and skipped.
+Run with: python import_products.py listings.csv --seller seller@example.com
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# Ensure we're in the right directory
+os.chdir(str(Path(__file__).parent))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import products from CSV or JSON Lines")
+    parser.add_argument('file', help="CSV (.csv) or JSON Lines (.jsonl, .ndjson) file")
+    parser.add_argument('--seller', required=True, help="Email of the seller the products belong to")
+    parser.add_argument('--format', help="csv or jsonl (defaults to the file extension)")
+    parser.add_argument('--batch-size', type=int, default=500, help="Rows per transaction")
+    args = parser.parse_args()
+
+    from app import create_app
+    from models.user import User
+    from services.product_import import detect_format, read_rows, import_products, ImportFormatError
+
+    try:
+        format = detect_format(args.format or args.file)
+    except ImportFormatError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    app = create_app()
+
+    with app.app_context():
+        seller = User.query.filter_by(email=args.seller).first()
+        if not seller:
+            print(f"❌ No user found with email {args.seller}")
+            sys.exit(1)
+
+        print(f"\nImporting {args.file} for {seller.username}...")
+        with open(args.file, 'rb') as stream:
+            result = import_products(read_rows(stream, format), seller.id, args.batch_size)
+
+    for error in result.errors:
+        print(f"❌ Line {error['line']}: {error['error']}")
+    if result.failed > len(result.errors):
+        print(f"... and {result.failed - len(result.errors)} more errors")
+    if result.stopped:
+        print(f"❌ {result.stopped}")
+
+    print(f"\n✅ Imported {result.imported} products, {result.failed} failed")
+    sys.exit(1 if result.failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+"""add product tombstones and updated_at index for change sync
+
+Revision ID: 33f6be9d7e17
+Revises: b7cfda252f39
+Create Date: 2026-10-18 11:03:27.551902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '33f6be9d7e17'
+down_revision = 'b7cfda252f39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('product_tombstones'):
+        op.create_table(
+            'product_tombstones',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('product_id', sa.Integer(), nullable=False),
+            sa.Column('deleted_at', sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_product_tombstones_deleted_at_product_id', 'product_tombstones',
+                        ['deleted_at', 'product_id'], unique=False)
+
+    if 'ix_products_updated_at_id' not in {index['name'] for index in inspector.get_indexes('products')}:
+        op.create_index('ix_products_updated_at_id', 'products', ['updated_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_products_updated_at_id', table_name='products')
+    op.drop_index('ix_product_tombstones_deleted_at_product_id', table_name='product_tombstones')
+    op.drop_table('product_tombstones')
@@ -0,0 +1,34 @@
+"""add product view count and index for sort=popular
+
+Revision ID: 5c2e8a91d4f3
+Revises: 33f6be9d7e17
+Create Date: 2026-10-18 14:12:40.318277
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e8a91d4f3'
+down_revision = '33f6be9d7e17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if 'view_count' not in {column['name'] for column in inspector.get_columns('products')}:
+        with op.batch_alter_table('products', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('view_count', sa.Integer(), server_default='0', nullable=False))
+
+    if 'ix_products_is_sold_view_count_id' not in {index['name'] for index in inspector.get_indexes('products')}:
+        op.create_index('ix_products_is_sold_view_count_id', 'products',
+                        ['is_sold', 'view_count', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_products_is_sold_view_count_id', table_name='products')
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('view_count')
@@ -0,0 +1,97 @@
+"""add product facet counts table and triggers
+
+The counts of unsold products per category and condition are kept in
+product_facet_counts by triggers on products (see services/facets.py).
+The table is filled from the current rows when it is created. Databases
+built with db.create_all() already have it, so everything is created only
+if missing.
+
+Revision ID: 83e86a33908c
+Revises: a4c7e2f95b10
+Create Date: 2026-10-18 21:40:12.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '83e86a33908c'
+down_revision = 'a4c7e2f95b10'
+branch_labels = None
+depends_on = None
+
+
+FACET_TABLE = 'product_facet_counts'
+FACETS = ('category', 'condition')
+
+
+def _increment(facet, row):
+    return f"""
+        INSERT INTO {FACET_TABLE}(facet, value, count)
+        SELECT '{facet}', {row}.{facet}, 1
+        WHERE {row}.{facet} IS NOT NULL AND NOT COALESCE({row}.is_sold, 0)
+        ON CONFLICT(facet, value) DO UPDATE SET count = count + 1;
+    """
+
+
+def _decrement(facet, row):
+    return f"""
+        UPDATE {FACET_TABLE} SET count = count - 1
+        WHERE facet = '{facet}' AND value = {row}.{facet} AND NOT COALESCE({row}.is_sold, 0);
+    """
+
+
+TRIGGERS = {
+    f'{FACET_TABLE}_ai': f"""
+    CREATE TRIGGER IF NOT EXISTS {FACET_TABLE}_ai AFTER INSERT ON products BEGIN
+        {''.join(_increment(facet, 'new') for facet in FACETS)}
+    END
+    """,
+    f'{FACET_TABLE}_ad': f"""
+    CREATE TRIGGER IF NOT EXISTS {FACET_TABLE}_ad AFTER DELETE ON products BEGIN
+        {''.join(_decrement(facet, 'old') for facet in FACETS)}
+    END
+    """,
+    f'{FACET_TABLE}_au': f"""
+    CREATE TRIGGER IF NOT EXISTS {FACET_TABLE}_au AFTER UPDATE OF category, condition, is_sold ON products BEGIN
+        {''.join(_decrement(facet, 'old') for facet in FACETS)}
+        {''.join(_increment(facet, 'new') for facet in FACETS)}
+    END
+    """,
+}
+
+
+def upgrade():
+    # The counts rely on SQLite triggers, other databases use a GROUP BY
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    if not sa.inspect(op.get_bind()).has_table(FACET_TABLE):
+        op.execute(f"""
+            CREATE TABLE {FACET_TABLE} (
+                facet VARCHAR(20) NOT NULL,
+                value VARCHAR(100) NOT NULL,
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (facet, value)
+            )
+        """)
+        for facet in FACETS:
+            op.execute(f"""
+                INSERT INTO {FACET_TABLE}(facet, value, count)
+                SELECT '{facet}', {facet}, COUNT(*) FROM products
+                WHERE {facet} IS NOT NULL AND NOT COALESCE(is_sold, 0)
+                GROUP BY {facet}
+            """)
+
+    for statement in TRIGGERS.values():
+        op.execute(statement)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.execute(f"DROP TABLE IF EXISTS {FACET_TABLE}")
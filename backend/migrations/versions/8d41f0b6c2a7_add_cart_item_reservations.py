@@ -0,0 +1,42 @@
+"""add cart item reservations
+
+Revision ID: 8d41f0b6c2a7
+Revises: 5c2e8a91d4f3
+Create Date: 2026-10-18 15:26:08.774512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41f0b6c2a7'
+down_revision = '5c2e8a91d4f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if 'reserved_until' not in {column['name'] for column in inspector.get_columns('cart_items')}:
+        with op.batch_alter_table('cart_items', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('reserved_until', sa.DateTime(), nullable=True))
+
+    existing = {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('cart_items')}
+    if 'ix_cart_items_product_id_reserved_until' not in existing:
+        op.create_index('ix_cart_items_product_id_reserved_until', 'cart_items',
+                        ['product_id', 'reserved_until'], unique=False)
+    if 'ix_cart_items_reserved_until' not in existing:
+        op.create_index('ix_cart_items_reserved_until', 'cart_items', ['reserved_until'], unique=False)
+    # Covered by the (product_id, reserved_until) index
+    if 'ix_cart_items_product_id' in existing:
+        op.drop_index('ix_cart_items_product_id', table_name='cart_items')
+
+
+def downgrade():
+    op.create_index('ix_cart_items_product_id', 'cart_items', ['product_id'], unique=False)
+    op.drop_index('ix_cart_items_reserved_until', table_name='cart_items')
+    op.drop_index('ix_cart_items_product_id_reserved_until', table_name='cart_items')
+    with op.batch_alter_table('cart_items', schema=None) as batch_op:
+        batch_op.drop_column('reserved_until')
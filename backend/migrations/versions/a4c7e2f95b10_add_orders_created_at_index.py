@@ -0,0 +1,25 @@
+"""add orders created_at index for the admin order listing
+
+Revision ID: a4c7e2f95b10
+Revises: f6b2d84e1a39
+Create Date: 2026-10-18 19:05:33.418920
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4c7e2f95b10'
+down_revision = 'f6b2d84e1a39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if 'ix_orders_created_at' not in {index['name'] for index in sa.inspect(op.get_bind()).get_indexes('orders')}:
+        op.create_index('ix_orders_created_at', 'orders', ['created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_orders_created_at', table_name='orders')
@@ -0,0 +1,50 @@
+"""add indexes for hot queries
+
+Databases created before migrations were introduced have the tables from
+db.create_all() but no secondary indexes. Indexes that already exist
+(for example on databases created from the current models) are skipped.
+
+Revision ID: b7cfda252f39
+Revises: 
+Create Date: 2026-10-18 09:12:40.118514
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7cfda252f39'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_products_is_sold_created_at_id', 'products', ['is_sold', 'created_at', 'id']),
+    ('ix_products_is_sold_category_created_at', 'products', ['is_sold', 'category', 'created_at']),
+    ('ix_products_is_sold_condition_created_at', 'products', ['is_sold', 'condition', 'created_at']),
+    ('ix_products_seller_id', 'products', ['seller_id']),
+    ('ix_cart_items_user_id_product_id', 'cart_items', ['user_id', 'product_id']),
+    ('ix_cart_items_product_id', 'cart_items', ['product_id']),
+    ('ix_orders_user_id_created_at', 'orders', ['user_id', 'created_at']),
+    ('ix_order_items_order_id', 'order_items', ['order_id']),
+    ('ix_order_items_product_id', 'order_items', ['product_id']),
+]
+
+
+def _existing_indexes(table):
+    inspector = sa.inspect(op.get_bind())
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        if name not in _existing_indexes(table):
+            op.create_index(name, table, columns, unique=False)
+
+
+def downgrade():
+    for name, table, columns in reversed(INDEXES):
+        if name in _existing_indexes(table):
+            op.drop_index(name, table_name=table)
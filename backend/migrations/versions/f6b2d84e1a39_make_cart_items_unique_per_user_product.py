@@ -0,0 +1,38 @@
+"""make cart items unique per user and product
+
+Revision ID: f6b2d84e1a39
+Revises: e3a9c5d7b812
+Create Date: 2026-10-18 17:52:14.663190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b2d84e1a39'
+down_revision = 'e3a9c5d7b812'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Keep the oldest row of each duplicate before the index can be unique
+    op.execute("""
+        DELETE FROM cart_items
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id
+        )
+    """)
+
+    indexes = {index['name']: index for index in sa.inspect(op.get_bind()).get_indexes('cart_items')}
+    if 'ix_cart_items_user_id_product_id' in indexes:
+        if indexes['ix_cart_items_user_id_product_id']['unique']:
+            return
+        op.drop_index('ix_cart_items_user_id_product_id', table_name='cart_items')
+    op.create_index('ix_cart_items_user_id_product_id', 'cart_items', ['user_id', 'product_id'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_cart_items_user_id_product_id', table_name='cart_items')
+    op.create_index('ix_cart_items_user_id_product_id', 'cart_items', ['user_id', 'product_id'], unique=False)
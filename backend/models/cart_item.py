@@ -3,9 +3,19 @@ from datetime import datetime
 
 class CartItem(db.Model):
     __tablename__ = 'cart_items'
+    __table_args__ = (
+        # A product is in a user's cart at most once
+        db.Index('ix_cart_items_user_id_product_id', 'user_id', 'product_id', unique=True),
+        # Serves lookups by product and the "held by someone else" check
+        db.Index('ix_cart_items_product_id_reserved_until', 'product_id', 'reserved_until'),
+        # Serves the sweeper that releases expired holds
+        db.Index('ix_cart_items_reserved_until', 'reserved_until'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set when cart reservations are enabled, see services.cart_reservations
+    reserved_until = db.Column(db.DateTime, nullable=True)
     
     # Foreign keys
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -31,6 +41,7 @@ class CartItem(db.Model):
             'user_id': self.user_id,
             'product_id': self.product_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
+            'reserved_until': self.reserved_until.isoformat() if self.reserved_until else None,
             'product': product_data
         }
     
@@ -3,6 +3,12 @@ from datetime import datetime
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        # Purchase history pages, by (created_at, id) within a user
+        db.Index('ix_orders_user_id_created_at', 'user_id', 'created_at'),
+        # Admin listing of every order
+        db.Index('ix_orders_created_at', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
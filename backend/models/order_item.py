@@ -3,6 +3,10 @@ from datetime import datetime
 
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
+    __table_args__ = (
+        db.Index('ix_order_items_order_id', 'order_id'),
+        db.Index('ix_order_items_product_id', 'product_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -16,10 +20,10 @@ class OrderItem(db.Model):
     order = db.relationship('Order', back_populates='order_items')
     product = db.relationship('Product', back_populates='order_items')
     
-    def to_dict(self):
+    def to_dict(self, include_product=True):
         product_data = None
         try:
-            if self.product:
+            if include_product and self.product:
                 product_data = self.product.to_dict()
         except Exception as e:
             product_data = {
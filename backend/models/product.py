@@ -1,10 +1,22 @@
 from extensions import db
+from services.images import thumbnail_urls
 from datetime import datetime
 from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.ext.associationproxy import association_proxy
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        # Serves the newest-first listing and its keyset pagination
+        db.Index('ix_products_is_sold_created_at_id', 'is_sold', 'created_at', 'id'),
+        db.Index('ix_products_is_sold_category_created_at', 'is_sold', 'category', 'created_at'),
+        db.Index('ix_products_is_sold_condition_created_at', 'is_sold', 'condition', 'created_at'),
+        db.Index('ix_products_seller_id', 'seller_id'),
+        # Serves the change feed for incremental sync
+        db.Index('ix_products_updated_at_id', 'updated_at', 'id'),
+        # Serves sort=popular
+        db.Index('ix_products_is_sold_view_count_id', 'is_sold', 'view_count', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
@@ -14,6 +26,8 @@ class Product(db.Model):
     category = db.Column(db.String(100), nullable=True)
     image_url = db.Column(db.String(255), nullable=True)
     is_sold = db.Column(db.Boolean, default=False)
+    # Written back in batches by services.view_counts
+    view_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -34,7 +48,9 @@ class Product(db.Model):
             'condition': self.condition,
             'category': self.category,
             'image_url': self.image_url,
+            'thumbnails': thumbnail_urls(self.image_url),
             'is_sold': self.is_sold,
+            'view_count': self.view_count,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None,
             'seller_id': self.seller_id,
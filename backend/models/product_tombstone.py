@@ -0,0 +1,22 @@
+from extensions import db
+from datetime import datetime
+
+class ProductTombstone(db.Model):
+    """Records deleted products so clients syncing changes can remove them"""
+    __tablename__ = 'product_tombstones'
+    __table_args__ = (
+        db.Index('ix_product_tombstones_deleted_at_product_id', 'deleted_at', 'product_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'deleted_at': self.deleted_at.isoformat() if self.deleted_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ProductTombstone {self.product_id}>'
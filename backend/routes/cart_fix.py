@@ -1,15 +1,59 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from models.user import User
+from models.roles import Role
 from models.product import Product
 from models.cart_item import CartItem
 from models.order import Order
 from models.order_item import OrderItem
 from extensions import db
+from sqlalchemy import case, func, update
+from sqlalchemy.orm import aliased, contains_eager, joinedload
+from services.product_events import products_changed
+from services.idempotency import idempotent
+from services.cart_reservations import add_reserved, add_reserved_many, held_by_others, held_product_ids
+from datetime import datetime
 from werkzeug.exceptions import BadRequest, NotFound, Unauthorized, UnprocessableEntity
 
 cart_bp = Blueprint('cart', __name__)
 
+def _cart_rows(user_id):
+    """
+    Load a user's cart in a single query.
+    
+    Starts from the user so an empty cart still returns one row (with
+    CartItem None) and an unknown user returns none. Each row carries the
+    cart item with its product, seller and role loaded, the reason the item
+    can't be bought ('sold', 'missing', 'reserved' by another user or None)
+    and the cart total, summed in SQL over the available items.
+    """
+    seller = aliased(User)
+    seller_role = aliased(Role)
+    
+    unavailable_reason = case(
+        (Product.id.is_(None), 'missing'),
+        (Product.is_sold == True, 'sold'),
+        (held_by_others(Product.id, user_id, datetime.utcnow()), 'reserved'),
+        else_=None
+    )
+    total = func.sum(case((unavailable_reason.is_(None), Product.price), else_=0)).over()
+    
+    return db.session.query(
+        CartItem,
+        unavailable_reason.label('unavailable_reason'),
+        total.label('total')
+    ).select_from(User) \
+        .outerjoin(CartItem, CartItem.user_id == User.id) \
+        .outerjoin(Product, Product.id == CartItem.product_id) \
+        .outerjoin(seller, seller.id == Product.seller_id) \
+        .outerjoin(seller_role, seller_role.id == seller.role_id) \
+        .options(contains_eager(CartItem.product)
+                 .contains_eager(Product.seller.of_type(seller))
+                 .contains_eager(seller.role.of_type(seller_role))) \
+        .filter(User.id == user_id) \
+        .order_by(CartItem.id) \
+        .all()
+
 @cart_bp.route('', methods=['GET'])
 @jwt_required()
 def get_cart():
@@ -21,40 +65,30 @@ def get_cart():
         if isinstance(current_user_id, str) and current_user_id.isdigit():
             current_user_id = int(current_user_id)
             
-        user = User.query.get(current_user_id)
+        rows = _cart_rows(current_user_id)
         
-        if not user:
+        if not rows:
             print(f"User not found: {current_user_id}")
             return jsonify({"message": "User not found"}), 404
         
-        cart_items = CartItem.query.filter_by(user_id=current_user_id).all()
+        # An empty cart is one row without a cart item
+        total = rows[0].total or 0
+        cart_items = [row for row in rows if row.CartItem is not None]
         print(f"Found {len(cart_items)} cart items for user {current_user_id}")
         
-        # Safely calculate total and check for missing/sold products
         valid_items = []
         unavailable_items = []
-        total = 0
         
-        for item in cart_items:
-            print(f"Processing cart item {item.id}, product_id: {item.product_id}")
-            if item.product:
-                print(f"Product exists, is_sold: {item.product.is_sold}")
-                if not item.product.is_sold:
-                    total += item.product.price
-                    valid_items.append(item.to_dict())
-                else:
-                    unavailable_items.append({
-                        "id": item.id,
-                        "product_id": item.product_id,
-                        "reason": "sold"
-                    })
-            else:
-                print(f"Product with ID {item.product_id} not found for cart item {item.id}")
+        for row in cart_items:
+            item = row.CartItem
+            if row.unavailable_reason:
                 unavailable_items.append({
                     "id": item.id,
                     "product_id": item.product_id,
-                    "reason": "missing"
+                    "reason": row.unavailable_reason
                 })
+            else:
+                valid_items.append(item.to_dict())
         
         print(f"Returning {len(valid_items)} valid items, {len(unavailable_items)} unavailable")
         return jsonify({
@@ -71,6 +105,7 @@ def get_cart():
 
 @cart_bp.route('', methods=['POST'])
 @jwt_required()
+@idempotent('add_to_cart')
 def add_to_cart():
     try:
         current_user_id = get_jwt_identity()
@@ -123,27 +158,38 @@ def add_to_cart():
             print(f"Product {product_id} is already sold")
             return jsonify({"message": "Product is no longer available", "details": "This item has already been sold"}), 400
         
-        # Check if product is already in cart
-        existing_item = CartItem.query.filter_by(user_id=current_user_id, product_id=product_id).first()
-        if existing_item:
-            print(f"Product {product_id} already in user's cart")
-            # Return success (200) instead of error (400)
-            return jsonify({
-                "message": "Product is already in your cart", 
-                "details": "This item is already in your shopping cart",
-                "cartItem": existing_item.to_dict()
-            }), 200  # Changed from 400 to 200
-        
         # Prevent adding own products to cart
         if product.seller_id == current_user_id:
             print(f"User {current_user_id} tried to add their own product to cart")
             return jsonify({"message": "You cannot add your own products to cart", "details": "You are the seller of this item"}), 400
         
-        # Add to cart
-        cart_item = CartItem(user_id=current_user_id, product_id=product_id)
-        db.session.add(cart_item)
+        # Add to cart, holding the product if reservations are enabled. The
+        # insert does nothing if the product is already in the cart or held
+        # by another user, so only then is the cart read to find out which.
+        cart_item, created = add_reserved(current_user_id, product_id)
+        if cart_item is None:
+            db.session.rollback()
+            existing_item = CartItem.query.filter_by(user_id=current_user_id, product_id=product_id).first()
+            if existing_item:
+                print(f"Product {product_id} already in user's cart")
+                # Return success (200) instead of error (400)
+                return jsonify({
+                    "message": "Product is already in your cart", 
+                    "details": "This item is already in your shopping cart",
+                    "cartItem": existing_item.to_dict()
+                }), 200  # Changed from 400 to 200
+            print(f"Product {product_id} is reserved by another user")
+            return jsonify({"message": "Product is reserved", "details": "This item is being held in another user's cart, try again later"}), 409
         db.session.commit()
         
+        if not created:
+            print(f"Renewed the hold on product {product_id} in user's cart")
+            return jsonify({
+                "message": "Product is already in your cart",
+                "details": "Your hold on this item has been renewed",
+                "cartItem": cart_item.to_dict()
+            }), 200
+        
         print(f"Product {product_id} added to cart successfully")
         return jsonify({
             "message": "Product added to cart successfully",
@@ -180,8 +226,123 @@ def remove_from_cart(id):
         "message": "Item removed from cart"
     }), 200
 
+# Most product ids a single batch request may add or remove
+MAX_CART_BATCH = 100
+
+def _batch_ids(data, name):
+    """Read a list of product ids from a batch request, without duplicates"""
+    values = data.get(name, [])
+    if not isinstance(values, list):
+        raise ValueError(f"{name} must be a list of product IDs")
+    try:
+        return list(dict.fromkeys(int(value) for value in values))
+    except (TypeError, ValueError):
+        raise ValueError(f"Product IDs in {name} must be numbers")
+
+@cart_bp.route('/batch', methods=['POST'])
+@jwt_required()
+@idempotent('cart_batch')
+def batch_update_cart():
+    """
+    Add and remove many products in one transaction.
+    
+    Every product is checked with a handful of set-based queries and gets
+    its own outcome, so one unavailable product doesn't fail the others.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Handle string user ID (convert to int if needed)
+        if isinstance(current_user_id, str) and current_user_id.isdigit():
+            current_user_id = int(current_user_id)
+        
+        user = User.query.get(current_user_id)
+        
+        if not user:
+            return jsonify({"message": "User not found"}), 404
+        
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or not data:
+            return jsonify({"message": "No JSON data provided", "details": "Send a JSON object with the product IDs to add and/or remove"}), 400
+        
+        try:
+            add_ids = _batch_ids(data, 'add')
+            remove_ids = _batch_ids(data, 'remove')
+        except ValueError as e:
+            return jsonify({"message": "Invalid request", "details": str(e)}), 400
+        
+        if not add_ids and not remove_ids:
+            return jsonify({"message": "Nothing to do", "details": "Send product IDs in add and/or remove"}), 400
+        if len(add_ids) + len(remove_ids) > MAX_CART_BATCH:
+            return jsonify({"message": "Too many products", "details": f"At most {MAX_CART_BATCH} products per request"}), 400
+        if set(add_ids) & set(remove_ids):
+            return jsonify({"message": "Invalid request", "details": "A product can't be both added and removed"}), 400
+        
+        all_ids = add_ids + remove_ids
+        in_cart = {product_id for (product_id,) in db.session.query(CartItem.product_id).filter(
+            CartItem.user_id == current_user_id, CartItem.product_id.in_(all_ids))}
+        
+        results = []
+        
+        if add_ids:
+            products = {product.id: product for product in db.session.query(
+                Product.id, Product.seller_id, Product.is_sold).filter(Product.id.in_(add_ids))}
+            held = held_product_ids(add_ids, current_user_id)
+            
+            statuses = {}
+            for product_id in add_ids:
+                product = products.get(product_id)
+                if product is None:
+                    statuses[product_id] = 'not_found'
+                elif product.is_sold:
+                    statuses[product_id] = 'sold'
+                elif product.seller_id == current_user_id:
+                    statuses[product_id] = 'own_product'
+                elif product_id in in_cart:
+                    statuses[product_id] = 'already_in_cart'
+                elif product_id in held:
+                    statuses[product_id] = 'reserved'
+            
+            # The insert rechecks holds, so a product held in the meantime is
+            # skipped. Products already in the cart go along to renew lapsed holds.
+            addable = [product_id for product_id in add_ids
+                       if statuses.get(product_id, 'already_in_cart') == 'already_in_cart']
+            added = add_reserved_many(current_user_id, addable)
+            for product_id in addable:
+                if product_id not in statuses:
+                    statuses[product_id] = 'added' if product_id in added else 'reserved'
+            
+            results.extend({"product_id": product_id, "action": "add", "status": statuses[product_id]}
+                           for product_id in add_ids)
+        
+        if remove_ids:
+            removing = [product_id for product_id in remove_ids if product_id in in_cart]
+            if removing:
+                CartItem.query.filter(CartItem.user_id == current_user_id,
+                                      CartItem.product_id.in_(removing)).delete(synchronize_session=False)
+            for product_id in remove_ids:
+                status = 'removed' if product_id in in_cart else 'not_in_cart'
+                results.append({"product_id": product_id, "action": "remove", "status": status})
+        
+        db.session.commit()
+        
+        return jsonify({
+            "results": results,
+            "added": sum(1 for result in results if result["status"] == 'added'),
+            "removed": sum(1 for result in results if result["status"] == 'removed')
+        }), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error updating cart: {str(e)}")
+        return jsonify({
+            "message": "Error processing your request",
+            "details": str(e)
+        }), 500
+
 @cart_bp.route('/checkout', methods=['POST'])
 @jwt_required()
+@idempotent('checkout')
 def checkout():
     try:
         current_user_id = get_jwt_identity()
@@ -211,7 +372,8 @@ def checkout():
         shipping_address = data.get('shipping_address', '')
         
         # Get cart items
-        cart_items = CartItem.query.filter_by(user_id=current_user_id).all()
+        cart_items = CartItem.query.options(joinedload(CartItem.product)) \
+            .filter_by(user_id=current_user_id).all()
         print(f"Found {len(cart_items)} items in cart for checkout")
         
         if not cart_items:
@@ -222,9 +384,10 @@ def checkout():
             }), 400
         
         # Check if all products are available
+        held = held_product_ids([item.product_id for item in cart_items], current_user_id)
         unavailable_products = []
         for item in cart_items:
-            if not item.product or item.product.is_sold:
+            if not item.product or item.product.is_sold or item.product_id in held:
                 product_name = item.product.title if item.product else "Unknown product"
                 print(f"Product unavailable: {product_name}")
                 unavailable_products.append({
@@ -240,8 +403,40 @@ def checkout():
                 "unavailableProducts": unavailable_products
             }), 400
         
+        # Claim the products with one conditional UPDATE. The check above can
+        # be outdated by the time we write, so only rows that are still unsold
+        # and not held in another user's cart are claimed; if another buyer got
+        # any of them first, fewer rows match and the whole order is rolled back.
+        product_names = {item.product_id: item.product.title for item in cart_items}
+        sold_product_ids = list(product_names)
+        claimed = db.session.execute(
+            update(Product)
+            .where(Product.id.in_(sold_product_ids), Product.is_sold.is_not(True),
+                   ~held_by_others(Product.id, current_user_id, datetime.utcnow()))
+            .values(is_sold=True)
+        ).rowcount
+        
+        if claimed != len(sold_product_ids):
+            db.session.rollback()
+            print(f"Checkout conflict: claimed {claimed} of {len(sold_product_ids)} products")
+            still_available = {id for (id,) in db.session.query(Product.id).filter(
+                Product.id.in_(sold_product_ids), Product.is_sold.is_not(True),
+                ~held_by_others(Product.id, current_user_id, datetime.utcnow()))}
+            return jsonify({
+                "message": "Some products are no longer available",
+                "details": "These items were bought or reserved by someone else while you were checking out",
+                "unavailableProducts": [
+                    {"id": product_id, "name": name}
+                    for product_id, name in product_names.items() if product_id not in still_available
+                ]
+            }), 409
+        
+        # Prices are read after the claim, inside the same write transaction
+        prices = dict(db.session.query(Product.id, Product.price)
+                      .filter(Product.id.in_(sold_product_ids)).all())
+        
         # Calculate total
-        total_amount = sum(item.product.price for item in cart_items)
+        total_amount = sum(prices[item.product_id] for item in cart_items)
         print(f"Total order amount: {total_amount}")
         
         # Create order
@@ -257,24 +452,19 @@ def checkout():
         
         print(f"Created order with ID: {order.id}")
         
-        # Create order items and mark products as sold
+        # Create order items and remove them from the cart
         for cart_item in cart_items:
             print(f"Processing cart item {cart_item.id} for checkout with order_id: {order.id}")
-            # Create order item
             order_item = OrderItem(
                 order_id=order.id,
                 product_id=cart_item.product_id,
-                price=cart_item.product.price
+                price=prices[cart_item.product_id]
             )
             db.session.add(order_item)
-            
-            # Mark product as sold
-            cart_item.product.is_sold = True
-            
-            # Remove from cart
             db.session.delete(cart_item)
         
         db.session.commit()
+        products_changed(*sold_product_ids)
         print(f"Checkout successful, created order ID: {order.id}")
         
         return jsonify({
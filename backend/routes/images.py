@@ -0,0 +1,71 @@
+import os
+from flask import Blueprint, request, jsonify, current_app, send_file, abort
+from flask_jwt_extended import jwt_required
+from services.images import (get_image_store, thumbnail_urls, InvalidImage,
+                             IMAGE_NAME, THUMBNAIL_NAME)
+
+images_bp = Blueprint('images', __name__)
+
+# Image URLs are content-addressed, so the bytes behind them never change
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# A thumbnail that isn't ready yet serves the original for a short while
+FALLBACK_MAX_AGE = 60
+
+@images_bp.route('', methods=['POST'])
+@jwt_required()
+def upload_image():
+    upload = request.files.get('image')
+    if upload is None:
+        return jsonify({"message": "No image uploaded, send it as the 'image' form field"}), 400
+
+    max_size = current_app.config['MAX_IMAGE_SIZE']
+    data = upload.stream.read(max_size + 1)
+    if not data:
+        return jsonify({"message": "Uploaded image is empty"}), 400
+    if len(data) > max_size:
+        return jsonify({"message": f"Image is larger than {max_size // (1024 * 1024)} MB"}), 413
+
+    try:
+        image_url, created = get_image_store().save(data)
+    except InvalidImage as e:
+        return jsonify({"message": str(e)}), 400
+
+    return jsonify({
+        "image_url": image_url,
+        "thumbnails": thumbnail_urls(image_url)
+    }), 201 if created else 200
+
+def _send_image(path, max_age):
+    response = send_file(path, max_age=max_age, conditional=True)
+    response.cache_control.public = True
+    if max_age == IMMUTABLE_MAX_AGE:
+        response.cache_control.immutable = True
+    return response
+
+@images_bp.route('/<name>', methods=['GET'])
+def get_image(name):
+    store = get_image_store()
+
+    match = IMAGE_NAME.match(name)
+    if match:
+        path = store.image_path(match.group('digest'), match.group('ext'))
+        if not os.path.isfile(path):
+            abort(404)
+        return _send_image(path, IMMUTABLE_MAX_AGE)
+
+    match = THUMBNAIL_NAME.match(name)
+    if not match:
+        abort(404)
+
+    digest = match.group('digest')
+    path = store.thumbnail_path(digest, match.group('size'))
+    if os.path.isfile(path):
+        return _send_image(path, IMMUTABLE_MAX_AGE)
+
+    ext = store.find_original(digest)
+    if ext is None:
+        abort(404)
+    # Queued again in case the process that was making it went away
+    store.queue_thumbnails(digest, ext)
+    return _send_image(store.image_path(digest, ext), FALLBACK_MAX_AGE)
@@ -3,9 +3,27 @@ from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from models.order import Order
 from models.user import User
 from extensions import db
+from services.pagination import paginate_by_cursor, InvalidCursor
+from services.order_filters import filter_orders, InvalidFilter, DEFAULT_PAGE_SIZE
 
 orders_bp = Blueprint('orders', __name__)
 
+def _order_page(query):
+    """One page of query, newest first, with the filters from the query string"""
+    per_page = request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int)
+    try:
+        query = filter_orders(query, request.args)
+        orders, next_cursor = paginate_by_cursor(query, Order, request.args.get('cursor'), per_page)
+    except InvalidFilter as e:
+        return jsonify({"message": "Invalid filter", "details": str(e)}), 400
+    except InvalidCursor as e:
+        return jsonify({"message": "Invalid cursor", "details": str(e)}), 400
+    
+    return jsonify({
+        "orders": [order.to_dict() for order in orders],
+        "next_cursor": next_cursor
+    }), 200
+
 @orders_bp.route('', methods=['GET'])
 @jwt_required()
 def get_orders():
@@ -14,21 +32,14 @@ def get_orders():
     
     # Admin can see all orders
     if claims.get('role') == 'admin':
-        orders = Order.query.order_by(Order.created_at.desc()).all()
-        return jsonify({
-            "orders": [order.to_dict() for order in orders]
-        }), 200
+        return _order_page(Order.query)
     
     # Regular users can only see their own orders
     user = User.query.get(current_user_id)
     if not user:
         return jsonify({"message": "User not found"}), 404
     
-    orders = Order.query.filter_by(user_id=current_user_id).order_by(Order.created_at.desc()).all()
-    
-    return jsonify({
-        "orders": [order.to_dict() for order in orders]
-    }), 200
+    return _order_page(Order.query.filter_by(user_id=current_user_id))
 
 @orders_bp.route('/<int:id>', methods=['GET'])
 @jwt_required()
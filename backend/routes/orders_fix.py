@@ -3,11 +3,58 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.user import User
 from models.order import Order
 from models.order_item import OrderItem
+from models.product import Product
 from extensions import db
+from sqlalchemy.orm import contains_eager
+from services.pagination import paginate_by_cursor, InvalidCursor
+from services.order_filters import filter_orders, InvalidFilter, DEFAULT_PAGE_SIZE
+from services.projection import parse_fields, project, row_to_dict, InvalidFields
+from services.conditional import make_etag, latest, is_not_modified, not_modified, conditional_json
 import traceback
 
 orders_bp = Blueprint('orders', __name__)
 
+def _load_order_items(orders, fields=None):
+    """
+    Load the items of orders and their products with a fixed number of queries.
+    
+    Items are fetched with one "order_id IN (...)" query that joins in their
+    products, sellers and roles. With fields the products are selected as
+    slim rows in a second query instead. Items are then grouped by order in
+    memory. Returns the item dicts by order id and the updated_at of each
+    product, for validators.
+    """
+    order_ids = [order.id for order in orders]
+    if not order_ids:
+        return {}, {}
+    
+    query = OrderItem.query.filter(OrderItem.order_id.in_(order_ids)).order_by(OrderItem.id)
+    products = {}
+    product_updated_at = {}
+    if fields:
+        items = query.all()
+        product_ids = {item.product_id for item in items}
+        if product_ids:
+            for row in project(Product.query.filter(Product.id.in_(product_ids)), fields):
+                products[row.id] = row_to_dict(row, fields)
+                product_updated_at[row.id] = row.updated_at
+    else:
+        items = query.outerjoin(OrderItem.product).outerjoin(Product.seller).outerjoin(User.role) \
+            .options(contains_eager(OrderItem.product)
+                     .contains_eager(Product.seller)
+                     .contains_eager(User.role)).all()
+        for item in items:
+            if item.product is not None and item.product_id not in products:
+                products[item.product_id] = item.product.to_dict()
+                product_updated_at[item.product_id] = item.product.updated_at
+    
+    items_by_order = {order_id: [] for order_id in order_ids}
+    for item in items:
+        item_dict = item.to_dict(include_product=False)
+        item_dict['product'] = products.get(item.product_id)
+        items_by_order[item.order_id].append(item_dict)
+    return items_by_order, product_updated_at
+
 @orders_bp.route('', methods=['GET'])
 @jwt_required()
 def get_orders():
@@ -27,28 +74,35 @@ def get_orders():
             print(f"User not found: {current_user_id}")
             return jsonify({"message": "User not found"}), 404
         
-        # Query orders for the user
-        orders = Order.query.filter_by(user_id=current_user_id).order_by(Order.created_at.desc()).all()
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except InvalidFields as e:
+            return jsonify({"message": "Invalid fields", "details": str(e)}), 400
+        
+        # One page of the user's orders, newest first by (created_at, id)
+        per_page = request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int)
+        try:
+            query = filter_orders(Order.query.filter_by(user_id=current_user_id), request.args)
+            orders, next_cursor = paginate_by_cursor(query, Order, request.args.get('cursor'), per_page)
+        except InvalidFilter as e:
+            return jsonify({"message": "Invalid filter", "details": str(e)}), 400
+        except InvalidCursor as e:
+            return jsonify({"message": "Invalid cursor", "details": str(e)}), 400
         print(f"Found {len(orders)} orders for user {current_user_id}")
         
+        # Items and products of every order, loaded together
+        items_by_order, _ = _load_order_items(orders, fields)
+        
         # Return orders as JSON
         orders_data = []
         for order in orders:
             order_dict = order.to_dict()
-            
-            # Add items from the order_items relationship
-            try:
-                order_dict['items'] = [item.to_dict() for item in order.order_items]
-                print(f"Added {len(order.order_items)} items to order {order.id}")
-            except Exception as e:
-                print(f"Error processing order items for order {order.id}: {str(e)}")
-                order_dict['items'] = []
-                order_dict['items_error'] = str(e)
-            
+            order_dict['items'] = items_by_order[order.id]
             orders_data.append(order_dict)
         
         return jsonify({
-            "orders": orders_data
+            "orders": orders_data,
+            "next_cursor": next_cursor
         }), 200
         
     except Exception as e:
@@ -72,6 +126,11 @@ def get_order(id):
         if isinstance(current_user_id, str) and current_user_id.isdigit():
             current_user_id = int(current_user_id)
             
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except InvalidFields as e:
+            return jsonify({"message": "Invalid fields", "details": str(e)}), 400
+        
         # Check if order exists
         order = Order.query.get(id)
         if not order:
@@ -82,20 +141,23 @@ def get_order(id):
             print(f"User {current_user_id} tried to access order {id} belonging to user {order.user_id}")
             return jsonify({"message": "You do not have permission to access this order"}), 403
         
+        items_by_order, product_updated_at = _load_order_items([order], fields)
+        items = items_by_order[order.id]
+        
+        # Items embed their product, so product edits change the validators too
+        etag = make_etag('order', order.id, order.updated_at,
+                         [(item['id'], product_updated_at.get(item['product_id'])) for item in items])
+        last_modified = latest(order.updated_at, *product_updated_at.values())
+        if is_not_modified(etag, last_modified):
+            return not_modified(etag, last_modified)
+        
         # Get order details
         order_dict = order.to_dict()
+        order_dict['items'] = items
         
-        # Add items using the order_items relationship
-        try:
-            order_dict['items'] = [item.to_dict() for item in order.order_items]
-        except Exception as e:
-            print(f"Error processing order items for order {id}: {str(e)}")
-            order_dict['items'] = []
-            order_dict['items_error'] = str(e)
-        
-        return jsonify({
+        return conditional_json({
             "order": order_dict
-        }), 200
+        }, etag, last_modified)
         
     except Exception as e:
         print(f"Error fetching order {id}: {str(e)}")
@@ -1,40 +1,159 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from models.product import Product
 from models.user import User
+from models.product_tombstone import ProductTombstone
 from extensions import db
+import json
+from services.search_index import apply_search
+from services.pagination import paginate_by_cursor, InvalidCursor
+from services.loading import product_options
+from services.cache import (cached_response, get_product_cache,
+                            product_list_key, product_list_tags,
+                            product_detail_key, product_detail_tags, facets_key)
+from services.facets import get_facet_counts
+from services.product_events import products_changed
+from services.suggest_index import get_suggest_index, DEFAULT_LIMIT, MAX_LIMIT
+from services.fuzzy_index import get_fuzzy_index
+from services.view_counts import counts_views
+from services import similar_items
+from services.product_import import (validate_product_data, detect_format, read_rows,
+                                     import_products, ImportFormatError)
+from services.product_changes import get_changes
+from services.timestamps import parse_timestamp
+from services.projection import parse_fields, project, row_to_dict, InvalidFields
+from services.conditional import make_etag, is_not_modified, not_modified, conditional_json
 
 products_bp = Blueprint('products', __name__)
 
+# Most products a single batch lookup may ask for
+MAX_BATCH_IDS = 500
+
+def _parse_ids(values):
+    """Turn ids from a query string or JSON body into a de-duplicated list of ints"""
+    if isinstance(values, str):
+        values = [value for value in values.split(',') if value.strip()]
+    if not isinstance(values, list):
+        raise ValueError("ids must be a list of product IDs")
+    try:
+        ids = list(dict.fromkeys(int(value) for value in values))
+    except (TypeError, ValueError):
+        raise ValueError("Product IDs must be numbers")
+    if len(ids) > MAX_BATCH_IDS:
+        raise ValueError(f"At most {MAX_BATCH_IDS} product IDs can be requested at once")
+    return ids
+
+def _products_by_ids(ids, fields):
+    """
+    Look up products with one IN query, in the requested order.
+    
+    Sold products are included, since carts and purchase history need them.
+    """
+    products = {}
+    if ids:
+        query = Product.query.filter(Product.id.in_(ids))
+        if fields:
+            products = {row.id: row_to_dict(row, fields) for row in project(query, fields)}
+        else:
+            products = {product.id: product.to_dict()
+                        for product in query.options(*product_options('selectin'))}
+    
+    return jsonify({
+        "products": [products[id] for id in ids if id in products],
+        "missing": [id for id in ids if id not in products]
+    }), 200
+
 @products_bp.route('', methods=['GET'])
+@cached_response(product_list_key, product_list_tags)
 def get_products():
     try:
         # Query parameters
         category = request.args.get('category')
         condition = request.args.get('condition')
         search = request.args.get('search')
+        sort = request.args.get('sort', 'newest')
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 12, type=int)
+        # Passing cursor (empty for the first page) switches to keyset pagination
+        cursor = request.args.get('cursor')
+        # Searches without exact matches fall back to typo-tolerant matching
+        fuzzy = request.args.get('fuzzy', 'true').lower() not in ('false', '0')
+        
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except InvalidFields as e:
+            return jsonify({"message": "Invalid fields", "details": str(e)}), 400
+        
+        # ?ids=1,2,3 looks up specific products instead of listing
+        if 'ids' in request.args:
+            try:
+                ids = _parse_ids(request.args['ids'])
+            except ValueError as e:
+                return jsonify({"message": "Invalid ids", "details": str(e)}), 400
+            return _products_by_ids(ids, fields)
         
         # Base query
-        query = Product.query.filter_by(is_sold=False)
+        query = Product.query.options(*product_options()).filter_by(is_sold=False)
         
         # Apply filters
         if category and category != 'all':
             query = query.filter_by(category=category)
         if condition:
             query = query.filter_by(condition=condition)
+        filtered = query
+        if search:
+            # Uses the full-text index, ranked by BM25 when sort=relevance
+            query = apply_search(query, search, order_by_relevance=(sort == 'relevance'))
+        
+        if fields:
+            # Select only the requested columns instead of whole rows
+            select = lambda query: project(query, fields)
+            serialize = lambda product: row_to_dict(product, fields)
+        else:
+            select = lambda query: query
+            serialize = lambda product: product.to_dict()
+        query = select(query)
+        
+        # Search results say whether they matched exactly or by similarity
         if search:
-            query = query.filter(Product.title.ilike(f'%{search}%') | 
-                                Product.description.ilike(f'%{search}%'))
+            serialize = _with_match(serialize)
+        
+        if cursor is not None:
+            if sort in ('relevance', 'popular'):
+                return jsonify({"message": f"Cursor pagination is not supported with sort={sort}"}), 400
+            try:
+                products, next_cursor = paginate_by_cursor(query, Product, cursor, per_page)
+            except InvalidCursor as e:
+                return jsonify({"message": "Invalid cursor", "details": str(e)}), 400
+            
+            if search and fuzzy and not products and not cursor:
+                products = _fuzzy_products(select(filtered), search, per_page)
+            
+            etag = _listing_etag(products, next_cursor)
+            if is_not_modified(etag):
+                return not_modified(etag)
+            return conditional_json({
+                "products": [serialize(product) for product in products],
+                "next_cursor": next_cursor
+            }, etag)
+        
+        if sort == 'popular':
+            # Persisted view counts, most viewed first
+            query = query.order_by(Product.view_count.desc(), Product.id.desc())
         
         # Apply pagination
         products = query.order_by(Product.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False)
+            page=page, per_page=per_page, error_out=False).items
+        
+        if search and fuzzy and not products and page == 1:
+            products = _fuzzy_products(select(filtered), search, per_page)
         
         # Return products as a list, not inside an object
         # This makes it compatible with frontend that expects an array directly
-        return jsonify([product.to_dict() for product in products.items]), 200
+        etag = _listing_etag(products)
+        if is_not_modified(etag):
+            return not_modified(etag)
+        return conditional_json([serialize(product) for product in products], etag)
     except Exception as e:
         current_app.logger.error(f"Error fetching products: {str(e)}")
         return jsonify({
@@ -42,14 +161,220 @@ def get_products():
             "details": str(e)
         }), 500
 
+@products_bp.route('/batch', methods=['POST'])
+def get_products_batch():
+    """Same as GET /api/products?ids=... for id lists too long for a URL"""
+    data = request.get_json(silent=True)
+    
+    if not isinstance(data, dict) or 'ids' not in data:
+        return jsonify({"message": "ids is required", "details": "Send a JSON object with an ids list"}), 400
+    
+    try:
+        ids = _parse_ids(data['ids'])
+        fields = data.get('fields')
+        if isinstance(fields, list):
+            if not all(isinstance(field, str) for field in fields):
+                raise ValueError("fields must be a string or a list of strings")
+            fields = ','.join(fields)
+        elif fields is not None and not isinstance(fields, str):
+            raise ValueError("fields must be a string or a list of strings")
+        fields = parse_fields(fields)
+    except ValueError as e:
+        return jsonify({"message": "Invalid request", "details": str(e)}), 400
+    
+    return _products_by_ids(ids, fields)
+
+@products_bp.route('/suggest', methods=['GET'])
+def suggest_products():
+    query = request.args.get('q', '')
+    limit = max(1, min(request.args.get('limit', DEFAULT_LIMIT, type=int), MAX_LIMIT))
+    
+    # Served from memory, the database is not queried
+    titles, categories = get_suggest_index().suggest(query, limit)
+    
+    return jsonify({
+        "query": query,
+        "titles": titles,
+        "categories": categories
+    }), 200
+
+@products_bp.route('/facets', methods=['GET'])
+@cached_response(facets_key, product_list_tags)
+def get_facets():
+    try:
+        return jsonify(get_facet_counts()), 200
+    except Exception as e:
+        current_app.logger.error(f"Error fetching facet counts: {str(e)}")
+        return jsonify({
+            "message": "Error retrieving facet counts",
+            "details": str(e)
+        }), 500
+
+@products_bp.route('/changes', methods=['GET'])
+def get_product_changes():
+    since = request.args.get('since')
+    cursor = request.args.get('cursor')
+    limit = request.args.get('limit', 100, type=int)
+    
+    if since:
+        try:
+            since = parse_timestamp(since)
+        except ValueError:
+            return jsonify({"message": "Invalid since", "details": "Expected an ISO 8601 timestamp"}), 400
+    
+    try:
+        changes, next_cursor, has_more = get_changes(since, cursor, limit)
+    except InvalidCursor as e:
+        return jsonify({"message": "Invalid cursor", "details": str(e)}), 400
+    
+    return jsonify({
+        "changes": changes,
+        "next_cursor": next_cursor,
+        "has_more": has_more
+    }), 200
+
+# Rows fetched from the database per round trip while exporting
+EXPORT_BATCH_SIZE = 1000
+
+@products_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_products():
+    claims = get_jwt()
+    
+    if claims.get('role') != 'admin':
+        return jsonify({"message": "Only admins can export the catalog"}), 403
+    
+    query = Product.query.options(*product_options())
+    
+    updated_since = request.args.get('updated_since')
+    if updated_since:
+        try:
+            query = query.filter(Product.updated_at > parse_timestamp(updated_since))
+        except ValueError:
+            return jsonify({"message": "Invalid updated_since", "details": "Expected an ISO 8601 timestamp"}), 400
+    
+    is_sold = request.args.get('is_sold')
+    if is_sold is not None:
+        if is_sold.lower() not in ('true', 'false', '1', '0'):
+            return jsonify({"message": "Invalid is_sold", "details": "Expected true or false"}), 400
+        query = query.filter(Product.is_sold == (is_sold.lower() in ('true', '1')))
+    
+    # Rows are streamed from the cursor in batches, so memory use doesn't
+    # grow with the size of the catalog
+    query = query.order_by(Product.id).execution_options(stream_results=True).yield_per(EXPORT_BATCH_SIZE)
+    
+    def generate():
+        try:
+            for product in query:
+                yield json.dumps(product.to_dict()) + '\n'
+        except Exception as e:
+            current_app.logger.error(f"Error exporting products: {str(e)}")
+            raise
+    
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+class _FuzzyMatch:
+    """A product found by similarity rather than by the full-text index"""
+    def __init__(self, product, similarity):
+        self.product = product
+        self.similarity = similarity
+    
+    def __getattr__(self, name):
+        return getattr(self.product, name)
+
+def _fuzzy_products(query, search, limit):
+    """Products from query whose titles resemble search, most similar first"""
+    similarity = dict(get_fuzzy_index().search(search))
+    if not similarity:
+        return []
+    products = query.filter(Product.id.in_(similarity)).all()
+    products.sort(key=lambda product: (-similarity[product.id], product.id))
+    return [_FuzzyMatch(product, similarity[product.id]) for product in products[:limit]]
+
+def _with_match(serialize):
+    def serialize_with_match(product):
+        if isinstance(product, _FuzzyMatch):
+            data = serialize(product.product)
+            data['match'] = 'fuzzy'
+            data['similarity'] = round(product.similarity, 3)
+        else:
+            data = serialize(product)
+            data['match'] = 'exact'
+        return data
+    return serialize_with_match
+
+def _listing_etag(products, *extra):
+    """
+    ETag for a page of products.
+    
+    Listings get no Last-Modified: when a product is deleted or sold an
+    older one can move onto the page without any timestamp increasing.
+    View counts are part of the payload but don't touch updated_at, so
+    they go into the ETag themselves.
+    """
+    return make_etag('products', [(product.id, product.updated_at, product.view_count)
+                                  for product in products], *extra)
+
 @products_bp.route('/<int:id>', methods=['GET'])
+@counts_views
+@cached_response(product_detail_key, product_detail_tags)
 def get_product(id):
-    product = Product.query.get(id)
+    product = Product.query.options(*product_options()).get(id)
     
     if not product:
         return jsonify({"message": "Product not found"}), 404
     
-    return jsonify(product.to_dict()), 200
+    # No Last-Modified: flushed view counts change the payload without
+    # changing updated_at, so only the ETag can tell the copies apart
+    etag = make_etag('product', product.id, product.updated_at, product.view_count)
+    if is_not_modified(etag):
+        return not_modified(etag)
+    return conditional_json(product.to_dict(), etag)
+
+@products_bp.route('/<int:id>/similar', methods=['GET'])
+@jwt_required(optional=True)
+def get_similar_products(id):
+    limit = max(1, min(request.args.get('limit', similar_items.DEFAULT_LIMIT, type=int),
+                       similar_items.MAX_LIMIT))
+    
+    try:
+        fields = parse_fields(request.args.get('fields'))
+    except InvalidFields as e:
+        return jsonify({"message": "Invalid fields", "details": str(e)}), 400
+    
+    # Signed-in users don't get their own listings recommended
+    current_user_id = get_jwt_identity()
+    if isinstance(current_user_id, str) and current_user_id.isdigit():
+        current_user_id = int(current_user_id)
+    
+    try:
+        neighbours = similar_items.similar_products(id, limit, exclude_seller_id=current_user_id)
+    except RuntimeError as e:
+        return jsonify({"message": "Similar items are not available", "details": str(e)}), 503
+    
+    if neighbours is None:
+        return jsonify({"message": "Product not found"}), 404
+    
+    scores = dict(neighbours)
+    products = []
+    if scores:
+        query = Product.query.filter(Product.id.in_(scores), Product.is_sold == False)
+        if fields:
+            products = [(row.id, row_to_dict(row, fields)) for row in project(query, fields)]
+        else:
+            products = [(product.id, product.to_dict())
+                        for product in query.options(*product_options('selectin'))]
+    products.sort(key=lambda item: -scores[item[0]])
+    
+    similar = []
+    for product_id, data in products:
+        data['score'] = round(scores[product_id], 4)
+        similar.append(data)
+    
+    return jsonify({
+        "product_id": id,
+        "similar": similar
+    }), 200
 
 @products_bp.route('', methods=['POST'])
 @jwt_required()
@@ -66,30 +391,61 @@ def create_product():
         return jsonify({"message": "No input data provided"}), 400
     
     # Validate required fields
-    required_fields = ['title', 'description', 'price', 'category', 'condition']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({"message": f"{field} is required"}), 400
+    try:
+        values = validate_product_data(data)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
     
     # Create new product
-    product = Product(
-        title=data['title'],
-        description=data['description'],
-        price=float(data['price']),
-        category=data['category'],
-        condition=data['condition'],
-        image_url=data.get('image_url'),
-        seller=user
-    )
+    product = Product(seller=user, **values)
     
     db.session.add(product)
     db.session.commit()
+    products_changed(product.id)
     
     return jsonify({
         "message": "Product created successfully",
         "product": product.to_dict()
     }), 201
 
+@products_bp.route('/import', methods=['POST'])
+@jwt_required()
+def bulk_import_products():
+    current_user_id = get_jwt_identity()
+    
+    # Handle string user ID (convert to int if needed)
+    if isinstance(current_user_id, str) and current_user_id.isdigit():
+        current_user_id = int(current_user_id)
+    
+    user = User.query.get(current_user_id)
+    
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+    
+    # The format comes from ?format= or the Content-Type of the body
+    try:
+        format = detect_format(request.args.get('format') or request.mimetype)
+    except ImportFormatError as e:
+        return jsonify({"message": "Unsupported import format", "details": str(e)}), 400
+    
+    # Rows are read from the request stream, not buffered in memory
+    result = import_products(read_rows(request.stream, format), user.id)
+    if result.imported:
+        products_changed()
+    
+    # Earlier batches are committed, so the partial result goes back too
+    if result.stopped:
+        return jsonify({
+            "message": f"Import stopped, imported {result.imported} products, {result.failed} failed",
+            "details": result.stopped,
+            **result.to_dict()
+        }), 400
+    
+    return jsonify({
+        "message": f"Imported {result.imported} products, {result.failed} failed",
+        **result.to_dict()
+    }), 200
+
 @products_bp.route('/<int:id>', methods=['PUT'])
 @jwt_required()
 def update_product(id):
@@ -124,6 +480,7 @@ def update_product(id):
         product.image_url = data['image_url']
     
     db.session.commit()
+    products_changed(id)
     
     return jsonify({
         "message": "Product updated successfully",
@@ -150,8 +507,21 @@ def delete_product(id):
         db.session.delete(cart_item)
     
     db.session.delete(product)
+    # Lets clients syncing through /changes drop the product
+    db.session.add(ProductTombstone(product_id=id))
     db.session.commit()
+    products_changed(id)
     
     return jsonify({
         "message": "Product deleted successfully"
-    }), 200
\ No newline at end of file
+    }), 200
+
+@products_bp.route('/cache/stats', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    claims = get_jwt()
+    
+    if claims.get('role') != 'admin':
+        return jsonify({"message": "Only admins can view cache statistics"}), 403
+    
+    return jsonify(get_product_cache().stats()), 200
\ No newline at end of file
@@ -3,6 +3,8 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from models.user import User
 from models.product import Product
 from extensions import db
+from services.loading import product_options
+from services.projection import parse_fields, project, row_to_dict, InvalidFields
 import traceback
 
 users_bp = Blueprint('users', __name__)
@@ -23,13 +25,22 @@ def get_user_products():
             print(f"User not found: {current_user_id}")
             return jsonify({"message": "User not found"}), 404
         
+        try:
+            fields = parse_fields(request.args.get('fields'))
+        except InvalidFields as e:
+            return jsonify({"message": "Invalid fields", "details": str(e)}), 400
+        
         # Fetch products listed by the user
-        products = Product.query.filter_by(seller_id=current_user_id).all()
+        query = Product.query.filter_by(seller_id=current_user_id)
+        if fields:
+            # Select only the requested columns instead of whole rows
+            products = project(query, fields).all()
+            products_data = [row_to_dict(product, fields) for product in products]
+        else:
+            products = query.options(*product_options('selectin')).all()
+            products_data = [product.to_dict() for product in products]
         print(f"Found {len(products)} products for user {current_user_id}")
         
-        # Convert products to dictionaries
-        products_data = [product.to_dict() for product in products]
-        
         return jsonify(products_data), 200
         
     except Exception as e:
@@ -0,0 +1 @@
+# This file initializes the services package
\ No newline at end of file
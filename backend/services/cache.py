@@ -0,0 +1,196 @@
+"""
+In-process response cache for public product reads.
+
+Entries are bounded by an LRU limit and a TTL and are tagged so writes can
+drop exactly the entries they affect: a change to one product drops that
+product's detail entry plus every cached listing (a new, edited or sold
+product can move in or out of any listing page).
+
+The cache lives in each worker process, so with several workers a write
+only clears the cache of the worker that handled it; the TTL bounds how
+long other workers can serve the old data.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+from services.product_events import on_products_changed
+
+LIST_TAG = 'products:list'
+
+# Query parameter values that mean the same as leaving the parameter out
+DEFAULT_ARGS = {
+    'page': '1',
+    'per_page': '12',
+    'sort': 'newest',
+    'category': 'all',
+}
+
+
+def product_tag(product_id):
+    return f'product:{product_id}'
+
+
+class ResponseCache:
+    def __init__(self, max_entries=1024, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped by every invalidation so a read that started before a
+        # write can't store its (now stale) result afterwards
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, tags=(), generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value, frozenset(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the given tags"""
+        tags = set(tags)
+        with self._lock:
+            self.generation += 1
+            stale = [key for key, entry in self._entries.items() if entry[2] & tags]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+def init_product_cache(app):
+    app.extensions['product_cache'] = ResponseCache(
+        max_entries=app.config.get('PRODUCT_CACHE_SIZE', 1024),
+        ttl=app.config.get('PRODUCT_CACHE_TTL', 60)
+    )
+
+
+def get_product_cache():
+    return current_app.extensions['product_cache']
+
+
+@on_products_changed
+def invalidate_products(product_ids):
+    """Drop cached reads affected by changes to the given products"""
+    cache = current_app.extensions.get('product_cache')
+    if cache is None:
+        return
+    if product_ids is None:
+        cache.clear()
+    else:
+        cache.invalidate(LIST_TAG, *(product_tag(id) for id in product_ids))
+
+
+def normalized_args(args):
+    """
+    Turn query parameters into a hashable key.
+
+    Parameters are sorted, empty values and defaults are dropped and the
+    search text is lowercased, so equivalent URLs share one entry. An empty
+    cursor is kept because it switches the listing to cursor mode.
+    """
+    items = []
+    for name, value in args.items(multi=True):
+        value = value.strip()
+        if name == 'search':
+            value = ' '.join(value.lower().split())
+        if (value == '' and name != 'cursor') or DEFAULT_ARGS.get(name) == value:
+            continue
+        items.append((name, value))
+    return tuple(sorted(items))
+
+
+def cached_response(key_func, tags_func):
+    """
+    Cache successful JSON responses of a view.
+
+    key_func and tags_func receive the view arguments and return the cache
+    key and the tags for the entry. Only 200 responses are stored, along
+    with their ETag and Last-Modified headers so cache hits can still be
+    answered with 304 Not Modified.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_product_cache()
+            key = key_func(*args, **kwargs)
+
+            cached = cache.get(key)
+            if cached is not None:
+                body, mimetype, validators = cached
+                response = current_app.response_class(body, status=200, mimetype=mimetype)
+                response.headers.extend(validators)
+                return response.make_conditional(request)
+
+            generation = cache.generation
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                validators = [(name, response.headers[name])
+                              for name in ('ETag', 'Last-Modified') if name in response.headers]
+                cache.set(key, (response.get_data(), response.mimetype, validators),
+                          tags_func(*args, **kwargs), generation)
+            return response
+        return wrapper
+    return decorator
+
+
+def product_list_key(*args, **kwargs):
+    return ('products', normalized_args(request.args))
+
+
+def product_list_tags(*args, **kwargs):
+    return (LIST_TAG,)
+
+
+def facets_key(*args, **kwargs):
+    return ('facets',)
+
+
+def product_detail_key(id):
+    return ('product', id)
+
+
+def product_detail_tags(id):
+    return (product_tag(id),)
@@ -0,0 +1,181 @@
+"""
+Time-limited cart reservations.
+
+With CART_RESERVATION_MINUTES set, adding a product to the cart holds it
+for that many minutes: the cart item gets a reserved_until time, and while
+the hold is active other users can't add the product or check it out. A
+background thread releases expired holds every
+CART_RESERVATION_SWEEP_INTERVAL seconds by clearing reserved_until, in
+batches so the write lock is never held for long. The items stay in their
+carts, so a checkout that already loaded them isn't affected.
+
+Holds are looked up through the (product_id, reserved_until) index and
+swept through the (reserved_until) index. Holds that expired but haven't
+been swept yet are already ignored by every check.
+"""
+
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import bindparam, exists, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import aliased
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Holds released per statement by the sweeper
+SWEEP_BATCH_SIZE = 500
+
+
+def reservation_minutes():
+    """Length of a hold, 0 when reservations are disabled"""
+    return current_app.config.get('CART_RESERVATION_MINUTES') or 0
+
+
+def held_by_others(product_id, user_id, now):
+    """SQL condition that a user other than user_id holds product_id"""
+    from models.cart_item import CartItem
+
+    hold = aliased(CartItem)
+    return exists().where(
+        hold.product_id == product_id,
+        hold.user_id != user_id,
+        hold.reserved_until > now
+    )
+
+
+def _dialect_insert(table):
+    # ON CONFLICT needs the dialect's own insert()
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+def _insert_unless_held():
+    """INSERT ... SELECT ... WHERE NOT EXISTS for one cart item, with bind parameters"""
+    from models.cart_item import CartItem
+
+    table = CartItem.__table__
+    user_id = bindparam('user_id', type_=db.Integer)
+    product_id = bindparam('product_id', type_=db.Integer)
+    now = bindparam('now', type_=db.DateTime)
+    row = select(user_id, product_id, now, bindparam('reserved_until', type_=db.DateTime)) \
+        .where(~held_by_others(product_id, user_id, now))
+    insert = _dialect_insert(table).from_select(
+        ['user_id', 'product_id', 'created_at', 'reserved_until'], row)
+    # Already in the cart is not an error, the unique (user_id, product_id)
+    # index turns the insert into a renewal of the caller's own hold if it
+    # has lapsed, and into a no-op otherwise
+    return insert.on_conflict_do_update(
+        index_elements=['user_id', 'product_id'],
+        set_={'reserved_until': insert.excluded.reserved_until},
+        where=insert.excluded.reserved_until.isnot(None)
+        & (table.c.reserved_until.is_(None) | (table.c.reserved_until <= insert.excluded.created_at))
+    )
+
+
+def _insert_params(user_id, product_ids):
+    now = datetime.utcnow()
+    minutes = reservation_minutes()
+    reserved_until = now + timedelta(minutes=minutes) if minutes else None
+    return [{'user_id': user_id, 'product_id': product_id, 'now': now, 'reserved_until': reserved_until}
+            for product_id in product_ids]
+
+
+def add_reserved(user_id, product_id):
+    """
+    Add a product to a cart unless it's already there or another user holds it.
+
+    The checks and the insert are one statement, so two users adding the
+    same product at once can't both get a hold and a double click can't add
+    it twice. A product already in the cart whose hold has lapsed gets a new
+    hold instead. Returns (cart item, created), with a None cart item if
+    nothing was inserted or renewed.
+    """
+    from models.cart_item import CartItem
+
+    params = _insert_params(user_id, [product_id])[0]
+    result = db.session.execute(_insert_unless_held(), params)
+    if result.rowcount != 1:
+        return None, False
+    cart_item = CartItem.query.filter_by(user_id=user_id, product_id=product_id) \
+        .populate_existing().one()
+    # A renewed item keeps its original created_at
+    return cart_item, cart_item.created_at == params['now']
+
+
+def add_reserved_many(user_id, product_ids):
+    """
+    Add many products to a cart in one executemany, skipping held ones.
+
+    Products already in the cart only get their hold renewed if it has
+    lapsed; the caller checks for them beforehand to report them. Returns
+    the set of product ids that are in the cart afterwards.
+    """
+    from models.cart_item import CartItem
+
+    if not product_ids:
+        return set()
+    db.session.execute(_insert_unless_held(), _insert_params(user_id, product_ids))
+    rows = db.session.query(CartItem.product_id).filter(
+        CartItem.user_id == user_id, CartItem.product_id.in_(product_ids))
+    return {product_id for (product_id,) in rows}
+
+
+def held_product_ids(product_ids, user_id):
+    """The products among product_ids that another user holds"""
+    from models.cart_item import CartItem
+
+    if not product_ids:
+        return set()
+    rows = db.session.query(CartItem.product_id).filter(
+        CartItem.product_id.in_(product_ids),
+        CartItem.user_id != user_id,
+        CartItem.reserved_until > datetime.utcnow()
+    ).distinct()
+    return {product_id for (product_id,) in rows}
+
+
+def sweep_expired_reservations(batch_size=SWEEP_BATCH_SIZE):
+    """Release holds that have expired, returns how many"""
+    from models.cart_item import CartItem
+
+    table = CartItem.__table__
+    now = datetime.utcnow()
+    released = 0
+    while True:
+        expired = select(table.c.id).where(table.c.reserved_until < now).limit(batch_size)
+        result = db.session.execute(
+            table.update().where(table.c.id.in_(expired.scalar_subquery())).values(reserved_until=None))
+        # One short transaction per batch
+        db.session.commit()
+        released += result.rowcount
+        if result.rowcount < batch_size:
+            return released
+
+
+def init_cart_reservations(app):
+    if not app.config.get('CART_RESERVATION_MINUTES'):
+        return
+    interval = app.config.get('CART_RESERVATION_SWEEP_INTERVAL', 30)
+
+    def run():
+        while True:
+            time.sleep(interval)
+            with app.app_context():
+                try:
+                    released = sweep_expired_reservations()
+                    if released:
+                        logger.info("Released %d expired cart reservations", released)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning("Could not release expired cart reservations: %s", e)
+                finally:
+                    db.session.remove()
+
+    threading.Thread(target=run, name='cart-reservation-sweeper', daemon=True).start()
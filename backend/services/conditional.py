@@ -0,0 +1,64 @@
+"""
+Conditional GET support (ETag / Last-Modified).
+
+Views compute validators from ids and updated_at columns, which they have
+already loaded, and call is_not_modified() before serializing anything.
+When the client's copy is still current it gets an empty 304 response
+and the view never builds the JSON body.
+"""
+
+import hashlib
+from datetime import timezone
+
+from flask import current_app, jsonify, request
+
+
+def make_etag(*parts):
+    """Build an ETag value from the ids and timestamps that make up a response"""
+    digest = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()
+    return digest[:32]
+
+
+def latest(*timestamps):
+    """The most recent of the given timestamps, ignoring missing ones"""
+    timestamps = [ts for ts in timestamps if ts is not None]
+    return max(timestamps) if timestamps else None
+
+
+def _http_date(timestamp):
+    # HTTP dates have one second resolution and our timestamps are naive UTC
+    return timestamp.replace(tzinfo=timezone.utc, microsecond=0)
+
+
+def is_not_modified(etag, last_modified=None):
+    """
+    Check the request's If-None-Match / If-Modified-Since headers.
+
+    If-Modified-Since is only used when the request has no If-None-Match,
+    as required by RFC 7232.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return _http_date(last_modified) <= request.if_modified_since
+    return False
+
+
+def set_validators(response, etag, last_modified=None):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = _http_date(last_modified)
+    return response
+
+
+def not_modified(etag, last_modified=None):
+    """An empty 304 response carrying the given validators"""
+    response = current_app.response_class(status=304)
+    return set_validators(response, etag, last_modified)
+
+
+def conditional_json(data, etag, last_modified=None, status=200):
+    """Serialize data into a response carrying the given validators"""
+    response = jsonify(data)
+    response.status_code = status
+    return set_validators(response, etag, last_modified)
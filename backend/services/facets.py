@@ -0,0 +1,154 @@
+"""
+Facet counts of unsold products per category and condition.
+
+The counts live in a small table maintained by triggers on the products
+table, so creating, editing, deleting or selling a product adjusts the
+affected counts by one instead of re-running a GROUP BY over the whole
+catalog. rebuild_facet_counts() recomputes the table from scratch in case
+it ever drifts.
+
+Existing databases get the table and triggers from a migration (flask db
+upgrade), databases built with db.create_all() right after the products
+table is created. Until the table exists, counts come from a GROUP BY.
+"""
+
+from flask import current_app
+from sqlalchemy import event, inspect, text
+
+from extensions import db
+
+FACET_TABLE = 'product_facet_counts'
+FACETS = ('category', 'condition')
+
+
+def _increment(facet, row):
+    return f"""
+        INSERT INTO {FACET_TABLE}(facet, value, count)
+        SELECT '{facet}', {row}.{facet}, 1
+        WHERE {row}.{facet} IS NOT NULL AND NOT COALESCE({row}.is_sold, 0)
+        ON CONFLICT(facet, value) DO UPDATE SET count = count + 1;
+    """
+
+
+def _decrement(facet, row):
+    return f"""
+        UPDATE {FACET_TABLE} SET count = count - 1
+        WHERE facet = '{facet}' AND value = {row}.{facet} AND NOT COALESCE({row}.is_sold, 0);
+    """
+
+
+_CREATE_STATEMENTS = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {FACET_TABLE} (
+        facet VARCHAR(20) NOT NULL,
+        value VARCHAR(100) NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (facet, value)
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FACET_TABLE}_ai AFTER INSERT ON products BEGIN
+        {''.join(_increment(facet, 'new') for facet in FACETS)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FACET_TABLE}_ad AFTER DELETE ON products BEGIN
+        {''.join(_decrement(facet, 'old') for facet in FACETS)}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FACET_TABLE}_au AFTER UPDATE OF category, condition, is_sold ON products BEGIN
+        {''.join(_decrement(facet, 'old') for facet in FACETS)}
+        {''.join(_increment(facet, 'new') for facet in FACETS)}
+    END
+    """,
+]
+
+_REBUILD_STATEMENTS = [f"DELETE FROM {FACET_TABLE}"] + [
+    f"""
+    INSERT INTO {FACET_TABLE}(facet, value, count)
+    SELECT '{facet}', {facet}, COUNT(*) FROM products
+    WHERE {facet} IS NOT NULL AND NOT COALESCE(is_sold, 0)
+    GROUP BY {facet}
+    """
+    for facet in FACETS
+]
+
+
+def _create_counts(connection):
+    """Create the counts table and triggers on a new products table"""
+    for statement in _CREATE_STATEMENTS + _REBUILD_STATEMENTS:
+        connection.exec_driver_sql(statement)
+
+
+def init_facet_counts(app):
+    """
+    Check whether the facet counts table is available.
+
+    Only reads the schema, the table itself comes from a migration or from
+    db.create_all().
+    """
+    from models.product import Product
+
+    app.extensions['facet_counts'] = False
+
+    @app.cli.command('rebuild-facets')
+    def rebuild_facets_command():
+        """Recompute the product facet counts"""
+        rebuild_facet_counts()
+        print("Facet counts rebuilt")
+
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'sqlite':
+            app.logger.info("Facet counts require SQLite triggers, counting with GROUP BY")
+            return
+
+        def after_create(target, connection, **kw):
+            try:
+                _create_counts(connection)
+                app.extensions['facet_counts'] = True
+            except Exception as e:
+                app.logger.warning(f"Could not create facet counts: {str(e)}")
+
+        event.listen(Product.__table__, 'after_create', after_create)
+
+        try:
+            with engine.connect() as connection:
+                inspector = inspect(connection)
+                if inspector.has_table(FACET_TABLE):
+                    app.extensions['facet_counts'] = True
+                elif inspector.has_table('products'):
+                    app.logger.warning("Facet counts table is missing, run 'flask db upgrade'")
+        except Exception as e:
+            app.logger.warning(f"Could not check for facet counts: {str(e)}")
+
+
+def rebuild_facet_counts():
+    """Recompute every count from the products table"""
+    for statement in _REBUILD_STATEMENTS:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+
+_GROUP_BY_SQL = ' UNION ALL '.join(
+    f"""
+    SELECT * FROM (SELECT '{facet}' AS facet, {facet} AS value, COUNT(*) AS count FROM products
+    WHERE {facet} IS NOT NULL AND NOT COALESCE(is_sold, 0)
+    GROUP BY {facet} ORDER BY {facet})
+    """
+    for facet in FACETS
+)
+
+
+def get_facet_counts():
+    """Counts of unsold products as {facet: {value: count}}"""
+    counts = {facet: {} for facet in FACETS}
+    if current_app.extensions.get('facet_counts'):
+        sql = f"SELECT facet, value, count FROM {FACET_TABLE} WHERE count > 0 ORDER BY facet, value"
+    else:
+        sql = _GROUP_BY_SQL
+    rows = db.session.execute(text(sql))
+    for facet, value, count in rows:
+        counts[facet][value] = count
+    return counts
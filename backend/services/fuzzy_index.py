@@ -0,0 +1,180 @@
+"""
+Typo-tolerant title matching with a trigram index.
+
+Rather than comparing the query with every title, the index works on the
+vocabulary of title words, which stays small even with hundreds of
+thousands of listings. Each word is split into trigrams ("jacket" ->
+"  j", " ja", "jac", "ack", "cke", "ket", "et "), and an inverted index
+maps every trigram to the words containing it. A misspelled query word
+("jaket") is matched to vocabulary words by trigram similarity (shared
+trigrams over all distinct trigrams), and the products containing those
+words are ranked by how well they cover the query words.
+
+Like the suggestion index it lives in memory, is loaded at startup and
+is updated through on_products_changed().
+"""
+
+import threading
+from collections import Counter, defaultdict
+
+from flask import current_app
+from sqlalchemy import inspect
+
+from extensions import db
+from services.product_events import on_products_changed
+from services.suggest_index import normalize
+
+# Minimum similarity for a vocabulary word to count as a match. Lower than
+# the usual 0.3 so swapped letters in short words ("bycicle") still match
+SIMILARITY_THRESHOLD = 0.2
+
+# Vocabulary words considered for each query word
+MAX_WORD_MATCHES = 10
+
+MAX_CANDIDATES = 500
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    def __init__(self):
+        self.loaded = False
+        self._trigram_words = defaultdict(set)
+        self._word_trigram_counts = {}
+        self._word_products = defaultdict(set)
+        self._product_words = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._product_words)
+
+    def _add(self, product_id, title):
+        words = set(normalize(title).split())
+        self._product_words[product_id] = words
+        for word in words:
+            if word not in self._word_products:
+                grams = trigrams(word)
+                self._word_trigram_counts[word] = len(grams)
+                for gram in grams:
+                    self._trigram_words[gram].add(word)
+            self._word_products[word].add(product_id)
+
+    def _remove(self, product_id):
+        for word in self._product_words.pop(product_id, ()):
+            products = self._word_products[word]
+            products.discard(product_id)
+            if products:
+                continue
+            # Last product using the word, drop it from the vocabulary
+            del self._word_products[word]
+            del self._word_trigram_counts[word]
+            for gram in trigrams(word):
+                words = self._trigram_words[gram]
+                words.discard(word)
+                if not words:
+                    del self._trigram_words[gram]
+
+    def load(self, rows):
+        """Replace the contents with (id, title) rows"""
+        with self._lock:
+            self._trigram_words = defaultdict(set)
+            self._word_trigram_counts = {}
+            self._word_products = defaultdict(set)
+            self._product_words = {}
+            for product_id, title in rows:
+                self._add(product_id, title)
+            self.loaded = True
+
+    def update(self, product_ids, rows):
+        """Re-index the given products from the (id, title) rows of those still unsold"""
+        with self._lock:
+            for product_id in product_ids:
+                self._remove(product_id)
+            for product_id, title in rows:
+                self._add(product_id, title)
+
+    def similar_words(self, word):
+        """Vocabulary words similar to word, as (word, similarity) pairs, best first"""
+        grams = trigrams(word)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self._trigram_words.get(gram, ()))
+
+        matches = []
+        for candidate, count in shared.items():
+            similarity = count / (len(grams) + self._word_trigram_counts[candidate] - count)
+            if similarity >= SIMILARITY_THRESHOLD:
+                matches.append((candidate, similarity))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        return matches[:MAX_WORD_MATCHES]
+
+    def search(self, query, limit=MAX_CANDIDATES):
+        """
+        Rank products by how closely their titles match the query words.
+
+        A product scores the best similarity it reaches for each query
+        word, averaged over the query words. Returns (product id, score)
+        pairs, best first.
+        """
+        words = normalize(query).split()
+        if not words:
+            return []
+
+        scores = defaultdict(float)
+        with self._lock:
+            for word in words:
+                best = {}
+                for candidate, similarity in self.similar_words(word):
+                    for product_id in self._word_products[candidate]:
+                        if similarity > best.get(product_id, 0):
+                            best[product_id] = similarity
+                for product_id, similarity in best.items():
+                    scores[product_id] += similarity / len(words)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+def _unsold_titles(product_ids=None):
+    from models.product import Product
+
+    query = db.session.query(Product.id, Product.title).filter(Product.is_sold == False)
+    if product_ids is not None:
+        query = query.filter(Product.id.in_(product_ids))
+    return query.all()
+
+
+def load_fuzzy_index():
+    index = current_app.extensions['fuzzy_index']
+    index.load(_unsold_titles())
+    return index
+
+
+def get_fuzzy_index():
+    """The app's index, loaded on first use if the app started without a products table"""
+    index = current_app.extensions['fuzzy_index']
+    if not index.loaded:
+        load_fuzzy_index()
+    return index
+
+
+@on_products_changed
+def refresh_fuzzy_index(product_ids):
+    index = current_app.extensions.get('fuzzy_index')
+    if index is None or not index.loaded:
+        return
+    if product_ids is None:
+        load_fuzzy_index()
+    else:
+        index.update(product_ids, _unsold_titles(product_ids))
+
+
+def init_fuzzy_index(app):
+    app.extensions['fuzzy_index'] = TrigramIndex()
+
+    with app.app_context():
+        if inspect(db.engine).has_table('products'):
+            load_fuzzy_index()
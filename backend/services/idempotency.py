@@ -0,0 +1,210 @@
+"""
+Idempotency-Key support for write endpoints.
+
+A client that may retry a request sends the same Idempotency-Key header
+with every attempt. The first attempt claims the key in the
+idempotency_keys table, runs the view and stores its response; retries find
+the stored response with one lookup on the (user_id, endpoint, key) index
+and get it back unchanged, with an Idempotent-Replayed header, instead of
+running the view again.
+
+- A retry that arrives while the first attempt is still running gets 409.
+- Reusing a key for a request with a different body gets 422.
+- Responses with a 5xx status aren't stored, so those requests can be
+  retried with the same key.
+
+Keys expire after IDEMPOTENCY_KEY_TTL seconds. Expired rows are deleted in
+small batches by the requests that claim new keys, at most once a minute
+per process.
+"""
+
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+
+MAX_KEY_LENGTH = 255
+
+# A claim this old without a response belongs to a request that died
+LOCK_TIMEOUT = timedelta(seconds=60)
+
+CLEANUP_INTERVAL = 60
+CLEANUP_BATCH_SIZE = 500
+
+_last_cleanup = 0.0
+_cleanup_lock = threading.Lock()
+
+
+def _current_user_id():
+    user_id = get_jwt_identity()
+    if isinstance(user_id, str) and user_id.isdigit():
+        user_id = int(user_id)
+    return user_id
+
+
+def _find(user_id, endpoint, key, now):
+    from models.idempotency_key import IdempotencyKey
+
+    return IdempotencyKey.query.filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.endpoint == endpoint,
+        IdempotencyKey.key == key,
+        IdempotencyKey.expires_at > now
+    ).first()
+
+
+def _claim(user_id, endpoint, key, request_hash, now):
+    """
+    Claim a key for a new request.
+
+    Returns None when the key was claimed, or the row of the request that
+    claimed it first.
+    """
+    from models.idempotency_key import IdempotencyKey
+
+    # An expired row for the same key would break the unique constraint
+    IdempotencyKey.query.filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.endpoint == endpoint,
+        IdempotencyKey.key == key,
+        IdempotencyKey.expires_at <= now
+    ).delete(synchronize_session=False)
+
+    ttl = timedelta(seconds=current_app.config.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+    db.session.add(IdempotencyKey(user_id=user_id, endpoint=endpoint, key=key,
+                                  request_hash=request_hash, created_at=now, expires_at=now + ttl))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return _find(user_id, endpoint, key, now)
+    return None
+
+
+def _take_over(record, request_hash, now):
+    """Claim a key whose first request never stored a response"""
+    from models.idempotency_key import IdempotencyKey
+
+    taken = db.session.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.id == record.id,
+               IdempotencyKey.status_code.is_(None),
+               IdempotencyKey.created_at == record.created_at)
+        .values(created_at=now, request_hash=request_hash)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    db.session.commit()
+    return taken
+
+
+def _store(user_id, endpoint, key, response):
+    from models.idempotency_key import IdempotencyKey
+
+    query = IdempotencyKey.query.filter_by(user_id=user_id, endpoint=endpoint, key=key)
+    if response.status_code >= 500:
+        query.delete(synchronize_session=False)
+    else:
+        query.update({'status_code': response.status_code,
+                      'response_body': response.get_data(as_text=True)},
+                     synchronize_session=False)
+    db.session.commit()
+
+
+def _release(user_id, endpoint, key):
+    from models.idempotency_key import IdempotencyKey
+
+    db.session.rollback()
+    IdempotencyKey.query.filter_by(user_id=user_id, endpoint=endpoint, key=key) \
+        .delete(synchronize_session=False)
+    db.session.commit()
+
+
+def _replay(record):
+    response = current_app.response_class(record.response_body, status=record.status_code,
+                                          mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def delete_expired_keys(now=None):
+    """Delete one batch of expired keys, returns how many"""
+    from models.idempotency_key import IdempotencyKey
+
+    table = IdempotencyKey.__table__
+    expired = select(table.c.id).where(table.c.expires_at <= (now or datetime.utcnow())) \
+        .limit(CLEANUP_BATCH_SIZE)
+    deleted = db.session.execute(table.delete().where(table.c.id.in_(expired.scalar_subquery()))).rowcount
+    db.session.commit()
+    return deleted
+
+
+def _cleanup_if_due(now):
+    global _last_cleanup
+    with _cleanup_lock:
+        if time.monotonic() - _last_cleanup < CLEANUP_INTERVAL:
+            return
+        _last_cleanup = time.monotonic()
+    delete_expired_keys(now)
+
+
+def idempotent(endpoint):
+    """
+    Replay the stored response when a request repeats an Idempotency-Key.
+
+    Goes below @jwt_required(), since keys belong to the calling user.
+    Requests without the header run as usual.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if key is None:
+                return view(*args, **kwargs)
+
+            key = key.strip()
+            if not key or len(key) > MAX_KEY_LENGTH:
+                return jsonify({
+                    "message": "Invalid Idempotency-Key",
+                    "details": f"The key must be 1 to {MAX_KEY_LENGTH} characters"
+                }), 400
+
+            user_id = _current_user_id()
+            request_hash = hashlib.sha256(request.get_data()).hexdigest()
+            now = datetime.utcnow()
+
+            record = _find(user_id, endpoint, key, now)
+            if record is None:
+                _cleanup_if_due(now)
+                record = _claim(user_id, endpoint, key, request_hash, now)
+
+            if record is not None:
+                if record.request_hash != request_hash:
+                    return jsonify({
+                        "message": "Idempotency-Key already used",
+                        "details": "This key was sent before with a different request"
+                    }), 422
+                if record.status_code is not None:
+                    return _replay(record)
+                if record.created_at > now - LOCK_TIMEOUT or not _take_over(record, request_hash, now):
+                    return jsonify({
+                        "message": "Request already in progress",
+                        "details": "A request with this Idempotency-Key is still being processed"
+                    }), 409
+
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception:
+                _release(user_id, endpoint, key)
+                raise
+            _store(user_id, endpoint, key, response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,236 @@
+"""
+Local storage for uploaded product images.
+
+Images are stored under the SHA-256 of their bytes, so uploading the same
+file twice stores it once and the URL of a file never changes. That makes
+it safe to serve them with a year-long, immutable Cache-Control.
+
+Image URLs are absolute, since the frontend is served from another origin
+and puts image_url straight into <img src>.
+
+Thumbnails are resized in a process pool so request workers only hash and
+write the original. Until a thumbnail exists its URL serves the original
+with a short cache lifetime. The pool's workers are spawned rather than
+forked from the threaded server, a pool broken by a dying worker is
+replaced on the next use, and images that can't be resized aren't retried
+by the same process. Resizing needs Pillow; without it uploads
+still work and every thumbnail URL falls back to the original.
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit
+
+from flask import current_app, url_for
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+URL_PREFIX = '/api/images'
+
+# Longest side of each thumbnail in pixels
+THUMBNAIL_SIZES = {
+    'small': 160,
+    'medium': 480,
+    'large': 1024,
+}
+
+# Recognised by their first bytes, not by the client's filename
+_SIGNATURES = [
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+]
+
+IMAGE_NAME = re.compile(r'^(?P<digest>[0-9a-f]{64})\.(?P<ext>jpg|png|gif|webp)$')
+THUMBNAIL_NAME = re.compile(r'^(?P<digest>[0-9a-f]{64})-(?P<size>small|medium|large)\.jpg$')
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def image_type(data):
+    """File extension for the image format of data, or None"""
+    for signature, ext in _SIGNATURES:
+        if data.startswith(signature):
+            return ext
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def thumbnail_urls(image_url):
+    """
+    Thumbnail URLs by size for an uploaded image, None for external URLs.
+
+    Thumbnails get the same origin as image_url, which is relative for
+    images uploaded before URLs were made absolute.
+    """
+    if not image_url:
+        return None
+    parts = urlsplit(image_url)
+    if not parts.path.startswith(URL_PREFIX + '/'):
+        return None
+    match = IMAGE_NAME.match(parts.path[len(URL_PREFIX) + 1:])
+    if not match:
+        return None
+    origin = f'{parts.scheme}://{parts.netloc}' if parts.netloc else ''
+    digest = match.group('digest')
+    return {size: f'{origin}{URL_PREFIX}/{digest}-{size}.jpg' for size in THUMBNAIL_SIZES}
+
+
+def _write_atomically(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+
+def make_thumbnails(source_path, targets):
+    """
+    Write a JPEG thumbnail of source_path for each (path, max side) pair.
+
+    Runs in the worker processes, so it only touches the filesystem.
+    """
+    with Image.open(source_path) as image:
+        image.load()
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        for path, max_side in targets:
+            thumbnail = image.copy()
+            thumbnail.thumbnail((max_side, max_side))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{os.getpid()}.tmp'
+            thumbnail.save(temp_path, 'JPEG', quality=85, optimize=True)
+            os.replace(temp_path, path)
+
+
+class ImageStore:
+    def __init__(self, folder, workers):
+        self.folder = folder
+        self.workers = workers
+        self._pool = None
+        self._pending = set()
+        # Digests whose thumbnails failed, served as the original from then on
+        self._failed = set()
+        self._lock = threading.Lock()
+
+    def _path(self, name, digest):
+        # Two-character fan-out keeps directories small
+        return os.path.join(self.folder, digest[:2], name)
+
+    def image_path(self, digest, ext):
+        return self._path(f'{digest}.{ext}', digest)
+
+    def thumbnail_path(self, digest, size):
+        return self._path(f'{digest}-{size}.jpg', digest)
+
+    def save(self, data):
+        """
+        Store image bytes and queue their thumbnails.
+
+        Returns (absolute image URL, created), where created is False when
+        the same image had already been uploaded. Raises InvalidImage if data is not
+        a supported image.
+        """
+        ext = image_type(data)
+        if ext is None:
+            raise InvalidImage("Unsupported image format, expected JPEG, PNG, GIF or WebP")
+
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.image_path(digest, ext)
+        created = not os.path.exists(path)
+        if created:
+            _write_atomically(path, data)
+
+        self.queue_thumbnails(digest, ext)
+        return url_for('images.get_image', name=f'{digest}.{ext}', _external=True), created
+
+    def queue_thumbnails(self, digest, ext):
+        if Image is None:
+            return
+        targets = [(self.thumbnail_path(digest, size), max_side)
+                   for size, max_side in THUMBNAIL_SIZES.items()
+                   if not os.path.exists(self.thumbnail_path(digest, size))]
+        if not targets:
+            return
+
+        with self._lock:
+            if digest in self._pending or digest in self._failed:
+                return
+            try:
+                future = self._submit(make_thumbnails, self.image_path(digest, ext), targets)
+            except BrokenProcessPool as e:
+                # The original is stored, so the upload still succeeds
+                logger.warning("Could not queue thumbnails for %s: %s", digest, e)
+                return
+            self._pending.add(digest)
+            pool = self._pool
+
+        def done(future):
+            error = future.exception()
+            with self._lock:
+                self._pending.discard(digest)
+                if isinstance(error, BrokenProcessPool):
+                    # A worker died, which says nothing about this image
+                    if self._pool is pool:
+                        self._drop_pool()
+                elif error is not None:
+                    self._failed.add(digest)
+            if error is not None:
+                logger.warning("Could not create thumbnails for %s: %s", digest, error)
+
+        future.add_done_callback(done)
+
+    def _submit(self, fn, *args):
+        # Called with self._lock held. A pool whose worker died refuses new
+        # work for good, so it's replaced once before giving up.
+        for attempt in range(2):
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            try:
+                return self._pool.submit(fn, *args)
+            except BrokenProcessPool:
+                self._drop_pool()
+                if attempt:
+                    raise
+
+    def _drop_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def find_original(self, digest):
+        """Extension of the stored original with this digest, or None"""
+        for ext in ('jpg', 'png', 'gif', 'webp'):
+            if os.path.exists(self.image_path(digest, ext)):
+                return ext
+        return None
+
+
+def get_image_store():
+    return current_app.extensions['images']
+
+
+def init_image_store(app):
+    app.extensions['images'] = ImageStore(app.config['UPLOAD_FOLDER'],
+                                          app.config['THUMBNAIL_WORKERS'])
+    if Image is None:
+        logger.warning("Pillow is not installed, thumbnails will fall back to the original images")
@@ -0,0 +1,35 @@
+"""
+Eager loading options used when serializing models.
+
+Product.to_dict() embeds the seller, and User.to_dict() reads the seller's
+role, so serializing a list of products with the default lazy loading runs
+two extra queries per product. Listing endpoints pass these options to
+their queries so the whole list is loaded in a fixed number of queries.
+
+The strategy can be chosen per endpoint: 'joined' adds the related rows to
+the main query with a JOIN (best for single rows and small pages), while
+'selectin' loads them in one extra "WHERE id IN (...)" query (best for
+long lists, where many rows share the same seller).
+"""
+
+from sqlalchemy.orm import joinedload, selectinload
+
+STRATEGIES = {
+    'joined': joinedload,
+    'selectin': selectinload,
+}
+
+
+def _loader(strategy):
+    try:
+        return STRATEGIES[strategy]
+    except KeyError:
+        raise ValueError(f"Unknown loading strategy: {strategy}")
+
+
+def product_options(strategy='joined'):
+    """Options for a Product query that load each seller and their role"""
+    from models.product import Product
+    from models.user import User
+
+    return [_loader(strategy)(Product.seller).joinedload(User.role)]
@@ -0,0 +1,50 @@
+"""
+Filters for order history listings.
+
+Both the purchase history and the admin listing accept the same query
+parameters on top of cursor pagination:
+
+- status=pending or status=pending,shipped
+- since=<ISO 8601 date or time>, orders created at or after it
+- until=<ISO 8601 date or time>, orders created before it
+
+Times with an offset are converted to UTC, times without one are UTC.
+"""
+
+from services.timestamps import parse_timestamp
+
+# Orders per page when per_page isn't given, capped by MAX_PAGE_SIZE
+DEFAULT_PAGE_SIZE = 20
+
+
+class InvalidFilter(ValueError):
+    pass
+
+
+def _parse_time(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        raise InvalidFilter(f"{name} must be an ISO 8601 date or time")
+
+
+def filter_orders(query, args):
+    """Apply the status and date range filters in args to an Order query"""
+    from models.order import Order
+
+    statuses = [status.strip() for status in args.get('status', '').split(',') if status.strip()]
+    if statuses:
+        query = query.filter(Order.status.in_(statuses))
+
+    since = _parse_time(args, 'since')
+    until = _parse_time(args, 'until')
+    if since and until and since >= until:
+        raise InvalidFilter("since must be earlier than until")
+    if since:
+        query = query.filter(Order.created_at >= since)
+    if until:
+        query = query.filter(Order.created_at < until)
+    return query
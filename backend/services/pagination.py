@@ -0,0 +1,65 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row on a page, encoded as an opaque
+URL-safe string. The next page is everything strictly after that key, so
+fetching page N costs the same as fetching page 1 and no COUNT(*) is
+needed.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(*key):
+    """Encode a sort key such as (created_at, id) into a cursor"""
+    payload = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in key])
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, types=(datetime, int)):
+    """Decode a cursor back into a sort key tuple with the given types"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("Wrong number of values")
+        return tuple(
+            datetime.fromisoformat(value) if type_ is datetime else type_(value)
+            for type_, value in zip(types, values)
+        )
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def paginate_by_cursor(query, model, cursor, per_page):
+    """
+    Return one page of query ordered newest first by (created_at, id).
+
+    Returns the rows and the cursor of the next page, which is None on the
+    last page. Raises InvalidCursor if cursor can't be decoded.
+    """
+    per_page = max(1, min(per_page, MAX_PAGE_SIZE))
+
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < (created_at, id))
+
+    # Fetch one extra row to find out whether there is a next page
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+
+    return rows, next_cursor
@@ -0,0 +1,34 @@
+"""
+Notifications about product writes.
+
+Routes call products_changed() after committing a change to products, and
+in-memory structures derived from the catalog (the response cache, the
+suggestion index, ...) register with on_products_changed() to update
+themselves. A failing listener is logged and doesn't affect the others or
+the response, since the write has already been committed.
+"""
+
+from flask import current_app
+
+_listeners = []
+
+
+def on_products_changed(listener):
+    """
+    Register a function to call after products change.
+
+    It receives a tuple of product ids, or None when any product may have
+    changed (for example after a bulk import).
+    """
+    _listeners.append(listener)
+    return listener
+
+
+def products_changed(*product_ids):
+    """Report products that were created, edited, sold or deleted"""
+    ids = product_ids or None
+    for listener in _listeners:
+        try:
+            listener(ids)
+        except Exception as e:
+            current_app.logger.error(f"Error updating {listener.__module__} after product changes: {str(e)}")
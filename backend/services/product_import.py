@@ -0,0 +1,212 @@
+"""
+Bulk product import from CSV or JSON Lines.
+
+Rows are read one at a time from the input stream, validated with the same
+rules as POST /api/products, and inserted in batches: each batch is one
+executemany INSERT and one commit. Invalid rows are reported with their
+line number and skipped. A batch the database rejects is retried one row at
+a time, so only the rows that fail are reported.
+"""
+
+import csv
+import json
+import logging
+
+from sqlalchemy import insert
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ['title', 'description', 'price', 'category', 'condition']
+OPTIONAL_FIELDS = ['image_url']
+
+FORMATS = {
+    'csv': 'csv',
+    'text/csv': 'csv',
+    'jsonl': 'jsonl',
+    'ndjson': 'jsonl',
+    'application/jsonl': 'jsonl',
+    'application/x-ndjson': 'jsonl',
+    'application/x-jsonlines': 'jsonl',
+}
+
+DEFAULT_BATCH_SIZE = 500
+
+# Stop listing individual errors after this many, but keep counting them
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+class UnreadableInput(ValueError):
+    """The input can't be read past this point, so the import stops"""
+
+
+def detect_format(name):
+    """Map a format name, file extension or content type to 'csv' or 'jsonl'"""
+    if not name:
+        raise ImportFormatError("Import format is required (csv or jsonl)")
+    name = name.split(';')[0].strip().lower().rsplit('.', 1)[-1]
+    if name not in FORMATS:
+        raise ImportFormatError(f"Unsupported import format: {name}")
+    return FORMATS[name]
+
+
+def validate_product_data(data):
+    """
+    Check product input and return the cleaned values.
+
+    Raises ValueError with a message suitable for the API response.
+    """
+    for field in REQUIRED_FIELDS:
+        value = data.get(field)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            raise ValueError(f"{field} is required")
+        if isinstance(value, (list, dict)):
+            raise ValueError(f"{field} must be a single value")
+    if isinstance(data.get('image_url'), (list, dict)):
+        raise ValueError("image_url must be a single value")
+    try:
+        price = float(data['price'])
+    except (TypeError, ValueError):
+        raise ValueError(f"price must be a number, received: {data['price']}")
+
+    values = {field: data[field] for field in REQUIRED_FIELDS}
+    values['price'] = price
+    for field in OPTIONAL_FIELDS:
+        values[field] = data.get(field)
+    return values
+
+
+def _decoded_lines(stream):
+    # Decoded one line at a time, so a bad byte only stops the line it's on
+    for line_number, line in enumerate(stream, 1):
+        yield line.decode('utf-8-sig' if line_number == 1 else 'utf-8')
+
+
+def read_rows(stream, format):
+    """
+    Yield (line number, row dict) pairs from a binary stream.
+
+    Rows that can't be parsed are yielded as (line number, ValueError). If
+    the input can't be decoded as UTF-8 or CSV, the last pair is (line
+    number, UnreadableInput) and nothing after it is read.
+    """
+    text = _decoded_lines(stream)
+
+    if format == 'csv':
+        reader = csv.DictReader(text)
+        try:
+            for row in reader:
+                # Empty CSV cells mean the field was left out
+                yield reader.line_num, {key: value for key, value in row.items()
+                                        if key is not None and value not in (None, '')}
+        except UnicodeDecodeError:
+            yield reader.line_num + 1, UnreadableInput("Input is not valid UTF-8")
+        except csv.Error as e:
+            yield reader.line_num, UnreadableInput(f"Invalid CSV: {str(e)}")
+        return
+
+    line_number = 0
+    lines = iter(text)
+    while True:
+        try:
+            line = next(lines)
+        except StopIteration:
+            return
+        except UnicodeDecodeError:
+            yield line_number + 1, UnreadableInput("Input is not valid UTF-8")
+            return
+        line_number += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, ValueError(f"Invalid JSON: {str(e)}")
+            continue
+        if not isinstance(row, dict):
+            yield line_number, ValueError("Each line must be a JSON object")
+            continue
+        yield line_number, row
+
+
+class ImportResult:
+    def __init__(self):
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+        # Why the input stopped being read, None when all of it was
+        self.stopped = None
+
+    def add_error(self, line_number, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line_number, "error": message})
+
+    def to_dict(self):
+        return {
+            'imported': self.imported,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'stopped': self.stopped
+        }
+
+
+def _flush(batch, result):
+    from models.product import Product
+
+    if not batch:
+        return
+    statement = insert(Product.__table__)
+    try:
+        db.session.execute(statement, [values for _, values in batch])
+        db.session.commit()
+        result.imported += len(batch)
+    except Exception as e:
+        db.session.rollback()
+        logger.warning("Import batch of %d rows failed, retrying row by row: %s", len(batch), e)
+        for line_number, values in batch:
+            try:
+                db.session.execute(statement, values)
+                db.session.commit()
+                result.imported += 1
+            except Exception as e:
+                db.session.rollback()
+                # The statement and its parameters stay in the server log
+                logger.warning("Import of line %d failed: %s", line_number, e)
+                result.add_error(line_number, "Database error: the product could not be saved")
+    batch.clear()
+
+
+def import_products(rows, seller_id, batch_size=DEFAULT_BATCH_SIZE):
+    """Validate and insert rows from read_rows() for one seller"""
+    result = ImportResult()
+    batch = []
+
+    for line_number, row in rows:
+        if isinstance(row, UnreadableInput):
+            # Rows read before this point are still imported
+            result.stopped = f"Stopped at line {line_number}: {row}"
+            result.add_error(line_number, str(row))
+            break
+        if isinstance(row, Exception):
+            result.add_error(line_number, str(row))
+            continue
+        try:
+            values = validate_product_data(row)
+        except ValueError as e:
+            result.add_error(line_number, str(e))
+            continue
+
+        values['seller_id'] = seller_id
+        batch.append((line_number, values))
+        if len(batch) >= batch_size:
+            _flush(batch, result)
+
+    _flush(batch, result)
+    return result
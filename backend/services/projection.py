@@ -0,0 +1,101 @@
+"""
+Sparse fieldsets for product payloads.
+
+Clients pass fields=title,price,image_url (or a preset such as
+fields=card) and the query selects only those columns, plus the seller's
+columns through a join when "seller" is requested. Rows come back as
+plain tuples and are turned into dicts shaped like Product.to_dict(),
+so no ORM objects are built and unused text columns such as description
+are never read.
+"""
+
+from datetime import datetime
+
+from sqlalchemy.orm import aliased
+
+from services.images import thumbnail_urls
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+# What a product grid card shows
+PRESETS = {
+    'card': ['id', 'title', 'price', 'image_url', 'category', 'condition', 'is_sold'],
+}
+
+PRODUCT_FIELDS = [
+    'id', 'title', 'description', 'price', 'condition', 'category', 'image_url',
+    'is_sold', 'view_count', 'created_at', 'updated_at', 'seller_id', 'seller',
+]
+
+SELLER_FIELDS = ['id', 'email', 'username', 'created_at', 'last_login', 'avatar_url']
+
+# Always selected because pagination and ETags need them
+_KEY_FIELDS = ['id', 'created_at', 'updated_at', 'view_count']
+
+
+def parse_fields(value):
+    """
+    Parse a fields= parameter into a list of product fields.
+
+    Returns None when the parameter is missing, meaning the full payload.
+    Raises InvalidFields for unknown names.
+    """
+    if value is None or not value.strip():
+        return None
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if not name:
+            continue
+        expanded = PRESETS.get(name, [name])
+        for field in expanded:
+            if field not in PRODUCT_FIELDS:
+                raise InvalidFields(f"Unknown field: {field}")
+            if field not in fields:
+                fields.append(field)
+    return fields
+
+
+def project(query, fields):
+    """Restrict a Product query to the columns needed for fields"""
+    from models.product import Product
+    from models.user import User
+    from models.roles import Role
+
+    columns = [getattr(Product, name).label(name)
+               for name in dict.fromkeys(_KEY_FIELDS + fields) if name != 'seller']
+
+    if 'seller' in fields:
+        seller = aliased(User)
+        role = aliased(Role)
+        columns += [getattr(seller, name).label(f'seller__{name}') for name in SELLER_FIELDS]
+        columns.append(role.name.label('seller__role'))
+        query = query.outerjoin(seller, Product.seller_id == seller.id) \
+                     .outerjoin(role, seller.role_id == role.id)
+
+    # Loader options only apply to whole entities
+    return query.enable_eagerloads(False).with_entities(*columns)
+
+
+def _json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def row_to_dict(row, fields):
+    """Build the payload for a row returned by a projected query"""
+    data = row._mapping
+    result = {}
+    for name in fields:
+        if name != 'seller':
+            result[name] = _json_value(data[name])
+            if name == 'image_url':
+                result['thumbnails'] = thumbnail_urls(data[name])
+        elif data['seller__id'] is None:
+            result['seller'] = None
+        else:
+            result['seller'] = {name: _json_value(data[f'seller__{name}']) for name in SELLER_FIELDS}
+            result['seller']['role'] = data['seller__role'] or 'user'
+    return result
@@ -0,0 +1,156 @@
+"""
+Full-text search over product titles and descriptions.
+
+The index is an SQLite FTS5 table using the products table as external
+content, so it only stores the inverted index. Triggers on the products
+table keep it in sync for every insert, update and delete, including the
+ones made by checkout and scripts that bypass the API routes.
+"""
+
+import re
+
+from flask import current_app
+from sqlalchemy import event, inspect, text
+
+from extensions import db
+
+FTS_TABLE = 'products_fts'
+
+# Title matches count ten times as much as description matches
+BM25_WEIGHTS = (10.0, 1.0)
+
+_CREATE_STATEMENTS = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description,
+        content='products', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON products BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, description ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+
+def _create_index(connection):
+    """Create the FTS table and triggers, returning True if the table is new"""
+    existed = inspect(connection).has_table(FTS_TABLE)
+    for statement in _CREATE_STATEMENTS:
+        connection.exec_driver_sql(statement)
+    if not existed:
+        connection.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return not existed
+
+
+def init_search_index(app):
+    """
+    Make sure the search index exists for the app's database.
+
+    Existing databases get the index built from their current rows, and
+    databases created later through db.create_all() get it right after the
+    products table is created.
+    """
+    from models.product import Product
+
+    app.extensions['search_index'] = False
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Rebuild the product full-text search index"""
+        rebuild_search_index()
+        print("Search index rebuilt")
+
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'sqlite':
+            app.logger.info("Full-text search index requires SQLite, falling back to LIKE search")
+            return
+
+        def after_create(target, connection, **kw):
+            try:
+                _create_index(connection)
+                app.extensions['search_index'] = True
+            except Exception as e:
+                app.logger.warning(f"Could not create full-text search index: {str(e)}")
+
+        event.listen(Product.__table__, 'after_create', after_create)
+
+        try:
+            with engine.begin() as connection:
+                if inspect(connection).has_table('products'):
+                    if _create_index(connection):
+                        app.logger.info("Built full-text search index for existing products")
+                    app.extensions['search_index'] = True
+        except Exception as e:
+            app.logger.warning(f"Could not create full-text search index: {str(e)}")
+
+
+def rebuild_search_index():
+    """Rebuild the whole index from the products table"""
+    db.session.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+    db.session.commit()
+
+
+def build_match_expression(search):
+    """
+    Turn free text into an FTS5 query.
+
+    Every word becomes a quoted prefix term, so "red bik" matches
+    "Red bicycle" and characters with special meaning in the FTS5 query
+    syntax can't cause errors. Returns None if there are no words.
+    """
+    words = re.findall(r'\w+', search.lower())
+    if not words:
+        return None
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def apply_search(query, search, order_by_relevance=False):
+    """
+    Restrict a Product query to rows matching the search text.
+
+    With order_by_relevance the best matches come first. Falls back to a
+    LIKE scan (in the default order) when the FTS index is unavailable.
+    """
+    from models.product import Product
+
+    match = build_match_expression(search)
+    if not current_app.extensions.get('search_index') or match is None:
+        query = query.filter(Product.title.ilike(f'%{search}%') |
+                             Product.description.ilike(f'%{search}%'))
+        return query
+
+    title_weight, description_weight = BM25_WEIGHTS
+    matches = text(
+        f"SELECT rowid AS product_id, bm25({FTS_TABLE}, :title_weight, :description_weight) AS rank "
+        f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"
+    ).bindparams(
+        match=match,
+        title_weight=title_weight,
+        description_weight=description_weight
+    ).columns(product_id=db.Integer, rank=db.Float).subquery('search_matches')
+
+    query = query.join(matches, Product.id == matches.c.product_id)
+    if order_by_relevance:
+        # bm25() returns lower (more negative) values for better matches
+        query = query.order_by(matches.c.rank)
+    return query
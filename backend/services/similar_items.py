@@ -0,0 +1,250 @@
+"""
+"Similar items" recommendations from hashed TF-IDF vectors.
+
+Each unsold product is turned into a fixed-size vector: words and word
+pairs from the title, the category and the words of the description are
+hashed into DIMENSIONS buckets, weighted by log term frequency and an IDF
+snapshot, and L2-normalized. The vectors are rows of one NumPy matrix, so
+the neighbours of a product are a single matrix-vector product followed
+by a partial sort, with sold products and the caller's own listings
+masked out.
+
+Rows are updated in place through on_products_changed(); freed rows are
+reused. The IDF weights are taken when the matrix is built and refreshed
+on the next full rebuild.
+
+NumPy is optional. Without it the feature is disabled and the endpoint
+reports it as unavailable.
+"""
+
+import math
+import threading
+import zlib
+from collections import Counter
+
+from flask import current_app
+from sqlalchemy import inspect
+
+from extensions import db
+from services.product_events import on_products_changed
+from services.suggest_index import normalize
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DIMENSIONS = 256
+
+# How much each source of features counts
+TITLE_WEIGHT = 2.0
+CATEGORY_WEIGHT = 3.0
+DESCRIPTION_WEIGHT = 1.0
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 50
+
+_INITIAL_CAPACITY = 1024
+
+
+def _bucket(feature):
+    # crc32 rather than hash() so buckets don't change between processes
+    return zlib.crc32(feature.encode('utf-8')) % DIMENSIONS
+
+
+def features(title, description, category):
+    """Hashed term counts of a product as {bucket: weight}"""
+    counts = Counter()
+    title_words = normalize(title).split()
+    for word in title_words:
+        counts[_bucket(f't:{word}')] += TITLE_WEIGHT
+    for first, second in zip(title_words, title_words[1:]):
+        counts[_bucket(f't:{first} {second}')] += TITLE_WEIGHT
+    if category:
+        counts[_bucket(f'c:{normalize(category)}')] += CATEGORY_WEIGHT
+    for word in normalize(description).split():
+        counts[_bucket(f'd:{word}')] += DESCRIPTION_WEIGHT
+    return counts
+
+
+class SimilarityMatrix:
+    def __init__(self):
+        self.loaded = False
+        self._vectors = np.zeros((_INITIAL_CAPACITY, DIMENSIONS), dtype=np.float32)
+        # Product id and seller id of each row, -1 for free rows
+        self._product_ids = np.full(_INITIAL_CAPACITY, -1, dtype=np.int64)
+        self._seller_ids = np.full(_INITIAL_CAPACITY, -1, dtype=np.int64)
+        self._rows = {}
+        self._free_rows = []
+        self._size = 0
+        self._idf = np.ones(DIMENSIONS, dtype=np.float32)
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def vectorize(self, title, description, category):
+        vector = np.zeros(DIMENSIONS, dtype=np.float32)
+        for bucket, count in features(title, description, category).items():
+            vector[bucket] = 1.0 + math.log(count)
+        vector *= self._idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _grow(self):
+        capacity = len(self._product_ids) * 2
+        vectors = np.zeros((capacity, DIMENSIONS), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        product_ids = np.full(capacity, -1, dtype=np.int64)
+        product_ids[:self._size] = self._product_ids[:self._size]
+        seller_ids = np.full(capacity, -1, dtype=np.int64)
+        seller_ids[:self._size] = self._seller_ids[:self._size]
+        self._vectors, self._product_ids, self._seller_ids = vectors, product_ids, seller_ids
+
+    def _set(self, product_id, seller_id, vector):
+        row = self._rows.get(product_id)
+        if row is None:
+            if self._free_rows:
+                row = self._free_rows.pop()
+            else:
+                if self._size == len(self._product_ids):
+                    self._grow()
+                row = self._size
+                self._size += 1
+            self._rows[product_id] = row
+        self._vectors[row] = vector
+        self._product_ids[row] = product_id
+        self._seller_ids[row] = seller_id
+
+    def _remove(self, product_id):
+        row = self._rows.pop(product_id, None)
+        if row is not None:
+            self._vectors[row] = 0
+            self._product_ids[row] = -1
+            self._seller_ids[row] = -1
+            self._free_rows.append(row)
+
+    def load(self, rows):
+        """Rebuild from (id, seller id, title, description, category) rows"""
+        rows = list(rows)
+        counts = np.zeros((max(_INITIAL_CAPACITY, len(rows)), DIMENSIONS), dtype=np.float32)
+        for row, (_, _, title, description, category) in enumerate(rows):
+            for bucket, count in features(title, description, category).items():
+                counts[row, bucket] = count
+
+        # Log term frequency, weighted by inverse document frequency
+        nonzero = counts > 0
+        document_frequency = nonzero[:len(rows)].sum(axis=0)
+        idf = (np.log((1 + len(rows)) / (1 + document_frequency)) + 1).astype(np.float32)
+        vectors = np.where(nonzero, 1.0 + np.log(counts, where=nonzero, out=np.ones_like(counts)), 0)
+        vectors = (vectors * idf).astype(np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+        product_ids = np.full(len(vectors), -1, dtype=np.int64)
+        seller_ids = np.full(len(vectors), -1, dtype=np.int64)
+        for row, (product_id, seller_id, _, _, _) in enumerate(rows):
+            product_ids[row] = product_id
+            seller_ids[row] = seller_id
+
+        with self._lock:
+            self._idf = idf
+            self._vectors = vectors
+            self._product_ids = product_ids
+            self._seller_ids = seller_ids
+            self._rows = {product_id: row for row, (product_id, *_) in enumerate(rows)}
+            self._free_rows = []
+            self._size = len(rows)
+            self.loaded = True
+
+    def update(self, product_ids, rows):
+        """Re-vectorize the given products from the rows of those still unsold"""
+        with self._lock:
+            for product_id in product_ids:
+                self._remove(product_id)
+            for product_id, seller_id, title, description, category in rows:
+                self._set(product_id, seller_id, self.vectorize(title, description, category))
+
+    def nearest(self, vector, limit=DEFAULT_LIMIT, exclude_product_id=None, exclude_seller_id=None):
+        """The most similar products to vector, as (product id, score) pairs"""
+        with self._lock:
+            size = self._size
+            scores = self._vectors[:size] @ vector
+            product_ids = self._product_ids[:size]
+
+            mask = product_ids == -1
+            if exclude_product_id is not None:
+                mask |= product_ids == exclude_product_id
+            if exclude_seller_id is not None:
+                mask |= self._seller_ids[:size] == exclude_seller_id
+            scores[mask] = -np.inf
+
+            limit = min(limit, size - int(mask.sum()))
+            if limit <= 0:
+                return []
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            top = top[np.argsort(-scores[top])]
+            return [(int(product_ids[row]), float(scores[row])) for row in top if scores[row] > 0]
+
+
+def _product_rows(product_ids=None, unsold_only=True):
+    from models.product import Product
+
+    query = db.session.query(Product.id, Product.seller_id, Product.title,
+                             Product.description, Product.category)
+    if unsold_only:
+        query = query.filter(Product.is_sold == False)
+    if product_ids is not None:
+        query = query.filter(Product.id.in_(product_ids))
+    return query.all()
+
+
+def load_similarity_matrix():
+    matrix = current_app.extensions['similar_items']
+    matrix.load(_product_rows())
+    return matrix
+
+
+def similar_products(product_id, limit=DEFAULT_LIMIT, exclude_seller_id=None):
+    """
+    Neighbours of a product as (product id, score) pairs, best first.
+
+    Returns None if the product doesn't exist. Raises RuntimeError if NumPy
+    isn't installed.
+    """
+    matrix = current_app.extensions.get('similar_items')
+    if matrix is None:
+        raise RuntimeError("Similar items need NumPy, which is not installed")
+    if not matrix.loaded:
+        load_similarity_matrix()
+
+    # Sold products aren't in the matrix, so vectorize the product directly
+    rows = _product_rows([product_id], unsold_only=False)
+    if not rows:
+        return None
+    _, _, title, description, category = rows[0]
+    vector = matrix.vectorize(title, description, category)
+    return matrix.nearest(vector, limit, exclude_product_id=product_id, exclude_seller_id=exclude_seller_id)
+
+
+@on_products_changed
+def refresh_similarity_matrix(product_ids):
+    matrix = current_app.extensions.get('similar_items')
+    if matrix is None or not matrix.loaded:
+        return
+    if product_ids is None:
+        load_similarity_matrix()
+    else:
+        matrix.update(product_ids, _product_rows(product_ids))
+
+
+def init_similar_items(app):
+    if np is None:
+        app.logger.warning("NumPy is not installed, similar items are disabled")
+        return
+
+    app.extensions['similar_items'] = SimilarityMatrix()
+
+    with app.app_context():
+        if inspect(db.engine).has_table('products'):
+            load_similarity_matrix()
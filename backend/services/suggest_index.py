@@ -0,0 +1,175 @@
+"""
+In-memory prefix index for search box suggestions.
+
+Every unsold product title is indexed under each of its word suffixes
+("red mountain bike", "mountain bike", "bike"), kept in one sorted list,
+so a prefix lookup is a bisect followed by a short forward scan and never
+touches the database. Category names are matched the same way and come
+with the number of unsold products in them.
+
+The index is loaded when the app starts and updated through
+on_products_changed(), which re-reads only the changed products. Each
+worker process has its own copy, and with several workers a write only
+updates the copy of the worker that handled it until the others restart.
+"""
+
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+
+from flask import current_app
+from sqlalchemy import inspect
+
+from extensions import db
+from services.product_events import on_products_changed
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+
+
+def normalize(text):
+    """Lowercase text and reduce it to single-space separated words"""
+    return ' '.join(re.findall(r'\w+', (text or '').lower()))
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.loaded = False
+        # Sorted (key, product id) pairs, one per word suffix of each title
+        self._entries = []
+        # product id -> (title, category) of every indexed product
+        self._products = {}
+        self._categories = Counter()
+        self._category_names = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._products)
+
+    def _add(self, product_id, title, category):
+        words = normalize(title).split()
+        for i in range(len(words)):
+            insort(self._entries, (' '.join(words[i:]), product_id))
+        self._products[product_id] = (title, category)
+        if category:
+            key = normalize(category)
+            self._categories[key] += 1
+            self._category_names.setdefault(key, category)
+
+    def _remove(self, product_id):
+        if product_id not in self._products:
+            return
+        title, category = self._products.pop(product_id)
+        words = normalize(title).split()
+        for i in range(len(words)):
+            entry = (' '.join(words[i:]), product_id)
+            position = bisect_left(self._entries, entry)
+            if position < len(self._entries) and self._entries[position] == entry:
+                del self._entries[position]
+        if category:
+            key = normalize(category)
+            self._categories[key] -= 1
+            if self._categories[key] <= 0:
+                del self._categories[key]
+                self._category_names.pop(key, None)
+
+    def load(self, rows):
+        """Replace the contents with (id, title, category) rows"""
+        with self._lock:
+            self._entries = []
+            self._products = {}
+            self._categories = Counter()
+            self._category_names = {}
+            for product_id, title, category in rows:
+                words = normalize(title).split()
+                self._entries.extend((' '.join(words[i:]), product_id) for i in range(len(words)))
+                self._products[product_id] = (title, category)
+                if category:
+                    key = normalize(category)
+                    self._categories[key] += 1
+                    self._category_names.setdefault(key, category)
+            self._entries.sort()
+            self.loaded = True
+
+    def update(self, product_ids, rows):
+        """
+        Apply changes to the given products.
+
+        rows are the current (id, title, category) values of those products
+        that are still unsold; ids without a row are removed.
+        """
+        with self._lock:
+            for product_id in product_ids:
+                self._remove(product_id)
+            for product_id, title, category in rows:
+                self._add(product_id, title, category)
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        prefix = normalize(query)
+        titles = []
+        if not prefix:
+            return titles, []
+
+        with self._lock:
+            seen = set()
+            position = bisect_left(self._entries, (prefix,))
+            while position < len(self._entries) and len(titles) < limit:
+                key, product_id = self._entries[position]
+                if not key.startswith(prefix):
+                    break
+                title = self._products[product_id][0]
+                if title.lower() not in seen:
+                    seen.add(title.lower())
+                    titles.append({'title': title, 'product_id': product_id})
+                position += 1
+
+            categories = [
+                {'name': self._category_names[key], 'count': count}
+                for key, count in sorted(self._categories.items())
+                if key.startswith(prefix) or any(word.startswith(prefix) for word in key.split())
+            ][:limit]
+
+        return titles, categories
+
+
+def _unsold_rows(product_ids=None):
+    from models.product import Product
+
+    query = db.session.query(Product.id, Product.title, Product.category).filter(Product.is_sold == False)
+    if product_ids is not None:
+        query = query.filter(Product.id.in_(product_ids))
+    return query.all()
+
+
+def load_suggest_index():
+    index = current_app.extensions['suggest_index']
+    index.load(_unsold_rows())
+    return index
+
+
+def get_suggest_index():
+    """The app's index, loaded on first use if the app started without a products table"""
+    index = current_app.extensions['suggest_index']
+    if not index.loaded:
+        load_suggest_index()
+    return index
+
+
+@on_products_changed
+def refresh_suggest_index(product_ids):
+    index = current_app.extensions.get('suggest_index')
+    if index is None or not index.loaded:
+        return
+    if product_ids is None:
+        load_suggest_index()
+    else:
+        index.update(product_ids, _unsold_rows(product_ids))
+
+
+def init_suggest_index(app):
+    app.extensions['suggest_index'] = PrefixIndex()
+
+    with app.app_context():
+        if inspect(db.engine).has_table('products'):
+            load_suggest_index()
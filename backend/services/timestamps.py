@@ -0,0 +1,21 @@
+"""
+Timestamps from query strings.
+
+Columns hold naive UTC datetimes, so a timestamp with an offset is converted
+to UTC and made naive before it's compared or bound against them. Naive
+input is taken to be UTC already.
+"""
+
+from datetime import datetime, timezone
+
+
+def to_naive_utc(value):
+    """value in UTC without tzinfo, unchanged if it is already naive"""
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 date or time into naive UTC, raises ValueError"""
+    return to_naive_utc(datetime.fromisoformat(value))
@@ -0,0 +1,99 @@
+"""
+Product view counters.
+
+Writing a row on every product read would queue all reads behind SQLite's
+single writer, so views are counted in memory and written back in one
+batched UPDATE every VIEW_COUNT_FLUSH_INTERVAL seconds by a background
+thread (and once more when the process exits).
+
+Each worker process keeps its own counts; the UPDATE adds to the stored
+value, so workers don't overwrite each other. Views still in memory are
+lost if a worker is killed, which is acceptable for a popularity signal.
+The stored count is what to_dict() and sort=popular see, so it lags by up
+to one flush interval plus the response cache TTL. Product ETags include
+the count, since the flush leaves updated_at alone.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+from functools import wraps
+
+from flask import current_app
+
+from extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Plain SQL so the flush doesn't bump updated_at through the model's
+# onupdate, which would put every viewed product in the change feed
+_INCREMENT = db.text("UPDATE products SET view_count = view_count + :views WHERE id = :product_id")
+
+
+class ViewCounter:
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, product_id):
+        with self._lock:
+            self._counts[product_id] += 1
+
+    def flush(self):
+        """Write the counted views to the database, returns the number written"""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        if not counts:
+            return 0
+
+        try:
+            db.session.execute(_INCREMENT, [
+                {'product_id': product_id, 'views': views}
+                for product_id, views in sorted(counts.items())
+            ])
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            # Kept for the next flush rather than dropped
+            with self._lock:
+                self._counts.update(counts)
+            logger.warning("Could not write product view counts: %s", e)
+            return 0
+        finally:
+            db.session.remove()
+        return sum(counts.values())
+
+
+def get_view_counter():
+    return current_app.extensions['view_counter']
+
+
+def counts_views(view):
+    """Count a view of the product when the view answers 200 or 304"""
+    @wraps(view)
+    def wrapper(id, *args, **kwargs):
+        response = current_app.make_response(view(id, *args, **kwargs))
+        if response.status_code in (200, 304):
+            get_view_counter().record(id)
+        return response
+    return wrapper
+
+
+def init_view_counter(app):
+    counter = ViewCounter()
+    app.extensions['view_counter'] = counter
+    interval = app.config.get('VIEW_COUNT_FLUSH_INTERVAL', 10)
+
+    def flush():
+        with app.app_context():
+            counter.flush()
+
+    def run():
+        while True:
+            time.sleep(interval)
+            flush()
+
+    threading.Thread(target=run, name='view-count-flush', daemon=True).start()
+    atexit.register(flush)
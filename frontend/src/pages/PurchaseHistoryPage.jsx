@@ -12,6 +12,9 @@ const PurchaseHistoryPage = () => {
   const [error, setError] = useState(null);
   const [successMessage, setSuccessMessage] = useState(location.state?.message || null);
   const [highlightedOrderId, setHighlightedOrderId] = useState(location.state?.orderId || null);
+  // Orders come in pages, next_cursor is null after the last one
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   
   // Check authentication and fetch orders
   useEffect(() => {
@@ -25,6 +28,75 @@ const PurchaseHistoryPage = () => {
     }
   }, [location.state?.message]);
   
+  // Fetch one page of orders, starting after cursor when given
+  const fetchOrders = async (cursor = null) => {
+    console.log("Fetching order history...");
+    const url = cursor
+      ? `http://localhost:5000/api/orders?cursor=${encodeURIComponent(cursor)}`
+      : 'http://localhost:5000/api/orders';
+    const response = await fetch(url, {
+      headers: getAuthHeader()
+    });
+    
+    console.log("Orders fetch response status:", response.status);
+    
+    // Handle authentication errors
+    if (response.status === 401 || response.status === 422) {
+      console.error("Authentication error. Redirecting to login");
+      removeToken();
+      navigate('/login', { state: { from: '/purchases', message: 'Your session has expired. Please log in again.' } });
+      return null;
+    }
+    
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.message || 'Failed to fetch your orders');
+    }
+    
+    const data = await response.json();
+    console.log("Orders data:", data);
+    
+    if (!data.orders || !Array.isArray(data.orders)) {
+      console.warn("No orders data returned or invalid format");
+      return { orders: [], nextCursor: null };
+    }
+    
+    // Sort orders by date (newest first)
+    const sortedOrders = data.orders.sort((a, b) => {
+      return new Date(b.created_at || 0) - new Date(a.created_at || 0);
+    });
+    
+    console.log(`Processed ${sortedOrders.length} orders`);
+    
+    // Process each order to ensure items array exists
+    const processedOrders = sortedOrders.map(order => {
+      return {
+        ...order,
+        items: Array.isArray(order.items) ? order.items : []
+      };
+    });
+    
+    return { orders: processedOrders, nextCursor: data.next_cursor || null };
+  };
+  
+  // Append the next page of older orders
+  const loadMoreOrders = async () => {
+    if (!nextCursor || loadingMore) return;
+    setLoadingMore(true);
+    try {
+      const page = await fetchOrders(nextCursor);
+      if (page) {
+        setOrders(current => [...current, ...page.orders]);
+        setNextCursor(page.nextCursor);
+      }
+    } catch (err) {
+      console.error('Error fetching more orders:', err);
+      setError(err.message || 'Failed to load more of your purchase history');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+  
   useEffect(() => {
     // Check authentication
     if (!isAuthenticated()) {
@@ -32,55 +104,14 @@ const PurchaseHistoryPage = () => {
       return;
     }
     
-    const fetchOrders = async () => {
+    const fetchFirstPage = async () => {
       setLoading(true);
       try {
-        console.log("Fetching order history...");
-        const response = await fetch('http://localhost:5000/api/orders', {
-          headers: getAuthHeader()
-        });
-        
-        console.log("Orders fetch response status:", response.status);
-        
-        // Handle authentication errors
-        if (response.status === 401 || response.status === 422) {
-          console.error("Authentication error. Redirecting to login");
-          removeToken();
-          navigate('/login', { state: { from: '/purchases', message: 'Your session has expired. Please log in again.' } });
-          return;
-        }
-        
-        if (!response.ok) {
-          const errorData = await response.json().catch(() => ({}));
-          throw new Error(errorData.message || 'Failed to fetch your orders');
+        const page = await fetchOrders();
+        if (page) {
+          setOrders(page.orders);
+          setNextCursor(page.nextCursor);
         }
-        
-        const data = await response.json();
-        console.log("Orders data:", data);
-        
-        if (!data.orders || !Array.isArray(data.orders)) {
-          console.warn("No orders data returned or invalid format");
-          setOrders([]);
-          return;
-        }
-        
-        // Sort orders by date (newest first)
-        const sortedOrders = data.orders.sort((a, b) => {
-          return new Date(b.created_at || 0) - new Date(a.created_at || 0);
-        });
-        
-        console.log(`Processed ${sortedOrders.length} orders`);
-        
-        // Process each order to ensure items array exists
-        const processedOrders = sortedOrders.map(order => {
-          return {
-            ...order,
-            items: Array.isArray(order.items) ? order.items : []
-          };
-        });
-          
-        setOrders(processedOrders);
-        
       } catch (err) {
         console.error('Error fetching orders:', err);
         setError(err.message || 'Failed to load your purchase history');
@@ -89,7 +120,7 @@ const PurchaseHistoryPage = () => {
       }
     };
     
-    fetchOrders();
+    fetchFirstPage();
   }, [navigate]);
 
   // Format date for display
@@ -242,6 +273,18 @@ const PurchaseHistoryPage = () => {
                 </div>
               </div>
             ))}
+            
+            {nextCursor && (
+              <div className="text-center">
+                <button
+                  onClick={loadMoreOrders}
+                  disabled={loadingMore}
+                  className="bg-green-600 text-white px-6 py-3 rounded-md hover:bg-green-700 transition disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load older orders'}
+                </button>
+              </div>
+            )}
           </div>
         )}
       </div>